@@ -1,14 +1,13 @@
 # import json
-import json
 import logging
 import re
+import time
 import traceback
-from typing import Callable, Tuple
 
 from slack_bolt import App
 from slack_bolt.adapter.aws_lambda import SlackRequestHandler
 
-from features import strava
+from utilities import jobs, request_logging, tracing
 from utilities.builders import add_loading_form, send_error_response
 from utilities.constants import LOCAL_DEVELOPMENT
 from utilities.database.orm import Region
@@ -19,7 +18,7 @@ from utilities.helper_functions import (
     safe_get,
     update_local_region_records,
 )
-from utilities.routing import MAIN_MAPPER
+from utilities.routing import ROUTER, Route, load_handler
 from utilities.slack.actions import LOADING_ID
 
 # SlackRequestHandler.clear_all_log_handlers()
@@ -37,7 +36,8 @@ app = App(
 
 def handler(event, context):
     if event.get("path") == "/exchange_token":
-        return strava.strava_exchange_token(event, context)
+        with tracing.trace("exchange_token", event["path"]):
+            return load_handler("features.strava.strava_exchange_token")(event, context)
     else:
         slack_handler = SlackRequestHandler(app=app)
         return slack_handler.handle(event, context)
@@ -45,39 +45,51 @@ def handler(event, context):
 
 def main_response(body, logger, client, ack, context):
     ack()
-    logger.info(json.dumps(body, indent=4))
-    team_id = safe_get(body, "team_id") or safe_get(body, "team", "id")
-    region_record: Region = get_region_record(team_id, body, context, client, logger)
-
     request_type, request_id = get_request_type(body)
-    lookup: Tuple[Callable, bool] = safe_get(safe_get(MAIN_MAPPER, request_type), request_id)
-    if lookup:
-        run_function, add_loading = lookup
-        if add_loading:
-            body[LOADING_ID] = add_loading_form(body=body, client=client)
+    route: Route = ROUTER.resolve(request_type, request_id)
+    # log and trace under the matched route's id, so ids with a dynamic suffix share one key
+    route_id = route.route_id if route else request_id
+    request_logging.log_request(body, request_type, route_id, logger)
+    with tracing.trace(request_type, route_id):
         try:
-            run_function(
-                body=body,
-                client=client,
-                logger=logger,
-                context=context,
-                region_record=region_record,
-            )
-        except Exception as exc:
-            logger.info("sending error response")
-            tb_str = "".join(traceback.format_exception(None, exc, exc.__traceback__))
-            send_error_response(body=body, client=client, error=str(exc)[:3000])
-            logger.error(tb_str)
-    else:
-        logger.error(
-            f"no handler for path: "
-            f"{safe_get(safe_get(MAIN_MAPPER, request_type), request_id) or request_type+', '+request_id}"
-        )
+            client = tracing.trace_slack_client(client)
+            team_id = safe_get(body, "team_id") or safe_get(body, "team", "id")
+            with tracing.span("region_lookup"):
+                region_record: Region = get_region_record(team_id, body, context, client, logger)
+
+            if route:
+                if route.add_loading:
+                    with tracing.span("loading_modal"):
+                        body[LOADING_ID] = add_loading_form(body=body, client=client)
+                start = time.perf_counter()
+                try:
+                    with tracing.span("handler", handler=route.handler_path):
+                        route.handler(
+                            body=body,
+                            client=client,
+                            logger=logger,
+                            context=context,
+                            region_record=region_record,
+                        )
+                except Exception as exc:
+                    logger.info("sending error response")
+                    tb_str = "".join(traceback.format_exception(None, exc, exc.__traceback__))
+                    send_error_response(body=body, client=client, error=str(exc)[:3000])
+                    logger.error(tb_str)
+                    request_logging.log_request_error(body, logger)
+                ROUTER.record(route, time.perf_counter() - start)
+                ROUTER.log_stats_if_due()
+            else:
+                logger.error(f"no handler for path: {request_type}, {request_id}")
+        finally:
+            # queued work runs once the request is handled, whether or not it matched a route
+            jobs.run_pending(logger)
 
 
 if LOCAL_DEVELOPMENT:
     ARGS = [main_response]
     LAZY_KWARGS = {}
+    ROUTER.load_all()
 else:
     ARGS = []
     LAZY_KWARGS = {
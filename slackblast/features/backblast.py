@@ -3,16 +3,16 @@ import json
 import os
 from datetime import datetime
 from logging import Logger
+from typing import Any, Dict, List
 
-import boto3
 import pytz
-import requests
 from cryptography.fernet import Fernet
 from slack_sdk.web import WebClient
+from sqlalchemy.exc import IntegrityError, OperationalError
 
-from utilities import constants, sendmail
-from utilities.database import DbManager
-from utilities.database.orm import Attendance, Backblast, PaxminerUser, Region
+from utilities import constants, image_pipeline, jobs, sendmail
+from utilities.database import DbManager, DbTransaction
+from utilities.database.orm import Attendance, Backblast, Region
 from utilities.helper_functions import (
     check_for_duplicate,
     get_channel_id,
@@ -25,6 +25,7 @@ from utilities.helper_functions import (
     replace_user_channel_ids,
     safe_get,
 )
+from utilities.paxminer_directory import get_paxminer_directory
 from utilities.slack import actions, forms
 from utilities.slack import orm as slack_orm
 
@@ -254,91 +255,20 @@ def handle_backblast_post(body: dict, client: WebClient, logger: Logger, context
 
     user_id = safe_get(body, "user_id") or safe_get(body, "user", "id")
 
-    file_list = []
-    low_res_file_list = []
-    file_send_list = []
     file_ids = [file["id"] for file in files] if files else []
     file_slack_urls = [file["permalink"] for file in files] if files else []
-    for file in files or []:
-        try:
-            r_full = requests.get(file["url_private_download"], headers={"Authorization": f"Bearer {client.token}"})
-            r_full.raise_for_status()
-
-            file_name = f"{file['id']}.{file['filetype']}"
-            file_path = f"/tmp/{file_name}"
-            file_mimetype = file["mimetype"]
-
-            # Determine the highest thumbnail size possible
-            highest_thumb = max(file["original_w"], file["original_h"])
-            thumb_sizes = [64, 80, 160, 480, 720, 800, 960, 1024]
-            thumb_size = next(
-                (size for size in thumb_sizes if size >= highest_thumb), 1024
-            )  # default to 1024 if no larger size found
-            r_low_res = requests.get(
-                file[f"thumb_{thumb_size}"],
-                headers={"Authorization": f"Bearer {client.token}"},
-                params={"width": constants.LOW_REZ_IMAGE_SIZE, "height": constants.LOW_REZ_IMAGE_SIZE},
-            )
-            file_name_low_res = f"{file['id']}_low_res.png"
-            file_path_low_res = f"/tmp/{file_name_low_res}"
-
-            with open(file_path, "wb") as f:
-                f.write(r_full.content)
-
-            with open(file_path_low_res, "wb") as f:
-                f.write(r_low_res.content)
-
-            # no longer doing conversion
-            # if file["filetype"] == "heic":
-            #     heic_img = Image.open(file_path)
-            #     x, y = heic_img.size
-            #     coeff = min(constants.MAX_HEIC_SIZE / max(x, y), 1)
-            #     heic_img = heic_img.resize((int(x * coeff), int(y * coeff)))
-            #     heic_img.save(file_path.replace(".heic", ".png"), quality=95, optimize=True, format="PNG")
-            #     coeff2 = min(constants.LOW_REZ_IMAGE_SIZE / max(x, y), 1)
-            #     heic_img = heic_img.resize((int(x * coeff2), int(y * coeff2)))
-            #     heic_img.save(file_path.replace(".heic", "_low_res.png"), quality=75, optimize=True, format="PNG")
-            #     os.remove(file_path)
-
-            #     file_path = file_path.replace(".heic", ".png")
-            #     file_name = file_name.replace(".heic", ".png")
-            #     file_mimetype = "image/png"
-            #     file_name_low_res = file_name.replace(".png", "_low_res.png")
-            #     file_path_low_res = file_path.replace(".png", "_low_res.png")
-
-            if constants.LOCAL_DEVELOPMENT:
-                s3_client = boto3.client(
-                    "s3",
-                    aws_access_key_id=os.environ[constants.AWS_ACCESS_KEY_ID],
-                    aws_secret_access_key=os.environ[constants.AWS_SECRET_ACCESS_KEY],
-                )
-            else:
-                s3_client = boto3.client("s3")
-            with open(file_path, "rb") as f:
-                s3_client.upload_fileobj(f, "slackblast-images", file_name, ExtraArgs={"ContentType": file_mimetype})
-            with open(file_path_low_res, "rb") as f:
-                s3_client.upload_fileobj(
-                    f, "slackblast-images", file_name_low_res, ExtraArgs={"ContentType": "image/png"}
-                )
-            file_list.append(f"https://slackblast-images.s3.amazonaws.com/{file_name}")
-            low_res_file_list.append(f"https://slackblast-images.s3.amazonaws.com/{file_name_low_res}")
-            file_send_list.append(
-                {
-                    "filepath": file_path,
-                    "meta": {
-                        "filename": file_name,
-                        "maintype": file_mimetype.split("/")[0],
-                        "subtype": file_mimetype.split("/")[1],
-                    },
-                }
-            )
-        except Exception as e:
-            logger.error(f"Error uploading file: {e}")
+    send_email = create_or_edit == "create" and (
+        (email_send and email_send == "yes") or (email_send is None and region_record.email_enabled == 1)
+    )
+    processed_files = image_pipeline.process_files(files, client.token, logger, keep_local_copy=send_email)
+    file_list = [processed.file_url for processed in processed_files]
+    low_res_file_list = [processed.low_res_file_url for processed in processed_files]
+    file_send_list = [processed.attachment for processed in processed_files if processed.attachment]
     user_id = safe_get(body, "user_id") or safe_get(body, "user", "id")
 
     user_records = None
     if region_record.paxminer_schema:
-        user_records = DbManager.find_records(PaxminerUser, filters=[True], schema=region_record.paxminer_schema)
+        user_records = get_paxminer_directory(region_record.paxminer_schema).users
 
     chan = destination
     if chan == "The_AO":
@@ -536,7 +466,7 @@ def handle_backblast_post(body: dict, client: WebClient, logger: Logger, context
             )
         logger.debug("\nMessage posted to Slack! \n{}".format(post_msg))
         print(json.dumps({"event_type": "successful_slack_post", "team_name": region_record.workspace_name}))
-        if (email_send and email_send == "yes") or (email_send is None and region_record.email_enabled == 1):
+        if send_email:
             moleskin_msg = moleskin_text_w_names
 
             if region_record.postie_format:
@@ -554,33 +484,19 @@ COUNT: {count}
 {moleskin_msg}
             """
 
-            try:
-                # Decrypt password
-                fernet = Fernet(os.environ[constants.PASSWORD_ENCRYPT_KEY].encode())
-                email_password_decrypted = fernet.decrypt(region_record.email_password.encode()).decode()
-                sendmail.send(
-                    subject=subject,
-                    body=email_msg,
-                    email_server=region_record.email_server,
-                    email_server_port=region_record.email_server_port,
-                    email_user=region_record.email_user,
-                    email_password=email_password_decrypted,
-                    email_to=region_record.email_to,
-                    attachments=file_send_list,
-                )
-                logger.debug("\nEmail Sent! \n{}".format(email_msg))
-                print(
-                    json.dumps(
-                        {
-                            "event_type": "successful_email_sent",
-                            "team_name": region_record.workspace_name,
-                        }
-                    )
-                )
-            except Exception as sendmail_err:
-                logger.error("Error with sendmail: {}".format(sendmail_err))
-                logger.debug("\nEmail Sent! \n{}".format(email_msg))
-                print(json.dumps({"event_type": "failed_email", "team_name": region_record.workspace_name}))
+            jobs.enqueue(
+                "backblast_email",
+                send_backblast_email,
+                max_attempts=1,
+                on_failure=lambda e: print(
+                    json.dumps({"event_type": "failed_email", "team_name": region_record.workspace_name})
+                ),
+                region_record=region_record,
+                subject=subject,
+                email_msg=email_msg,
+                attachments=file_send_list,
+                logger=logger,
+            )
 
     elif create_or_edit == "edit":
         text = (f"{moleskin_text_w_names}\n\nUse the 'New Backblast' button to create a new backblast")[:1500]
@@ -596,22 +512,6 @@ COUNT: {count}
         logger.debug("\nBackblast updated in Slack! \n{}".format(post_msg))
         print(json.dumps({"event_type": "successful_slack_edit", "team_name": region_record.workspace_name}))
 
-        if message_ts:
-            DbManager.delete_records(
-                cls=Backblast,
-                schema=region_record.paxminer_schema,
-                filters=[Backblast.timestamp == message_ts],
-            )
-            DbManager.delete_records(
-                cls=Attendance,
-                schema=region_record.paxminer_schema,
-                filters=[Attendance.timestamp == message_ts],
-            )
-        logger.debug("\nBackblast deleted from database! \n{}".format(post_msg))
-        print(json.dumps({"event_type": "successful_db_delete", "team_name": region_record.workspace_name}))
-
-    res_link = client.chat_getPermalink(channel=chan or message_channel, message_ts=res["ts"])
-
     if region_record.paxminer_schema is not None:
         backblast_parsed = f"""Backblast! {title}
 Date: {the_date}
@@ -622,71 +522,218 @@ FNGs: {fngs_formatted}
 COUNT: {count}
 {moleskin_text_w_names}
 """
-        try:
-            DbManager.create_record(
-                schema=region_record.paxminer_schema,
-                record=Backblast(
+        backblast_record = Backblast(
+            timestamp=message_ts or res["ts"],
+            ts_edited=safe_get(res, "message", "edited", "ts"),
+            ao_id=ao or chan,
+            bd_date=the_date,
+            q_user_id=the_q,
+            coq_user_id=the_coq[0] if the_coq else None,
+            pax_count=count,
+            backblast=f"{post_msg}\n{moleskin_text}".replace("*", ""),
+            backblast_parsed=backblast_parsed,
+            fngs=fngs_formatted if fngs else "None listed",
+            fng_count=fng_count,
+            json=custom_fields,
+        )
+
+        attendance_records = []
+        for pax_id in list(set(pax) | set(the_coq or []) | {the_q}):
+            attendance_records.append(
+                Attendance(
                     timestamp=message_ts or res["ts"],
                     ts_edited=safe_get(res, "message", "edited", "ts"),
+                    user_id=pax_id,
                     ao_id=ao or chan,
-                    bd_date=the_date,
+                    date=the_date,
                     q_user_id=the_q,
-                    coq_user_id=the_coq[0] if the_coq else None,
-                    pax_count=count,
-                    backblast=f"{post_msg}\n{moleskin_text}".replace("*", ""),
-                    backblast_parsed=backblast_parsed,
-                    fngs=fngs_formatted if fngs else "None listed",
-                    fng_count=fng_count,
-                    json=custom_fields,
-                ),
+                )
             )
 
-            attendance_records = []
-            for pax_id in list(set(pax) | set(the_coq or []) | {the_q}):
-                attendance_records.append(
-                    Attendance(
-                        timestamp=message_ts or res["ts"],
-                        ts_edited=safe_get(res, "message", "edited", "ts"),
-                        user_id=pax_id,
-                        ao_id=ao or chan,
-                        date=the_date,
-                        q_user_id=the_q,
-                    )
-                )
+        import_or_edit = "imported" if create_or_edit == "create" else "edited"
+        jobs.enqueue(
+            "backblast_db_save",
+            save_backblast_to_db,
+            on_failure=lambda e: notify_db_save_failed(client, context, region_record),
+            client=client,
+            logger=logger,
+            context=context,
+            region_record=region_record,
+            backblast_record=backblast_record,
+            attendance_records=attendance_records,
+            replace_ts=message_ts,
+            channel=chan or message_channel,
+            log_msg=f"Backblast successfully {import_or_edit} for AO: <#{ao or chan}> Date: {the_date} Q: {q_name}",
+        )
+
+    if file_send_list:
+        jobs.enqueue(
+            "remove_local_copies",
+            image_pipeline.remove_local_copies,
+            attachments=file_send_list,
+            logger=logger,
+        )
 
-            DbManager.create_records(schema=region_record.paxminer_schema, records=attendance_records)
-            print(
-                json.dumps(
-                    {
-                        "event_type": "successful_db_insert",
-                        "team_name": region_record.workspace_name,
-                    }
-                )
-            )
 
-            paxminer_log_channel = get_channel_id(name="paxminer_logs", client=client, logger=logger)
-            if paxminer_log_channel:
-                import_or_edit = "imported" if create_or_edit == "create" else "edited"
-                client.chat_postMessage(
-                    channel=paxminer_log_channel,
-                    text=f"Backblast successfully {import_or_edit} for AO: <#{ao or chan}> Date: {the_date} Q: {q_name}"
-                    f"\nLink: {res_link['permalink']}",
+def send_backblast_email(
+    region_record: Region, subject: str, email_msg: str, attachments: List[Dict[str, Any]], logger: Logger
+):
+    # Decrypt password
+    fernet = Fernet(os.environ[constants.PASSWORD_ENCRYPT_KEY].encode())
+    email_password_decrypted = fernet.decrypt(region_record.email_password.encode()).decode()
+    if region_record.email_attachment_limit:
+        attachment_limit = region_record.email_attachment_limit * 1024 * 1024
+    else:
+        attachment_limit = constants.EMAIL_ATTACHMENT_LIMIT
+    sendmail.send(
+        subject=subject,
+        body=email_msg,
+        email_server=region_record.email_server,
+        email_server_port=region_record.email_server_port,
+        email_user=region_record.email_user,
+        email_password=email_password_decrypted,
+        email_to=region_record.email_to,
+        attachments=attachments,
+        attachment_limit=attachment_limit,
+    )
+    logger.debug("\nEmail Sent! \n{}".format(email_msg))
+    print(
+        json.dumps(
+            {
+                "event_type": "successful_email_sent",
+                "team_name": region_record.workspace_name,
+            }
+        )
+    )
+
+
+def save_backblast_to_db(
+    client: WebClient,
+    logger: Logger,
+    context: dict,
+    region_record: Region,
+    backblast_record: Backblast,
+    attendance_records: List[Attendance],
+    replace_ts: str,
+    channel: str,
+    log_msg: str,
+):
+    """Writes a posted backblast and its attendance to the region's PAXMiner schema, applying it as an edit of the
+    rows for `replace_ts` if given, then announces it in the paxminer_logs channel if the region has one.
+
+    Transient database errors (OperationalError, e.g. a dropped connection or lock wait timeout) are raised so the
+    job is retried; the transaction has been rolled back, so a retry starts clean."""
+    try:
+        with DbManager.transaction(schema=region_record.paxminer_schema) as tx:
+            if replace_ts:
+                counts = apply_backblast_edit(tx, backblast_record, attendance_records, replace_ts)
+                logger.debug("\nBackblast updated in database! \n{} {}".format(replace_ts, counts))
+            else:
+                tx.bulk_insert(Backblast, [backblast_record])
+                tx.bulk_insert(
+                    Attendance, attendance_records, update_columns=[Attendance.timestamp, Attendance.ts_edited]
                 )
-        except Exception as e:
-            logger.error("Error saving backblast to database: {}".format(e))
+                counts = {"attendance_added": len(attendance_records)}
+    except IntegrityError as e:
+        logger.error("Error saving backblast to database: {}".format(e))
+        client.chat_postMessage(
+            channel=context["user_id"],
+            text="WARNING: The backblast you just posted was not saved to the database. There is already a "
+            "backblast for this AO and Q on this date. Please edit the backblast using the `Edit this backblast`"
+            "button. Thanks!",
+        )
+        print(json.dumps({"event_type": "failed_db_insert", "team_name": region_record.workspace_name}))
+        return
+    except OperationalError:
+        raise
+    except Exception as e:
+        logger.error("Error saving backblast to database: {}".format(e))
+        notify_db_save_failed(client, context, region_record)
+        return
+
+    print(
+        json.dumps(
+            {
+                "event_type": "successful_db_insert",
+                "team_name": region_record.workspace_name,
+                **counts,
+            }
+        )
+    )
+
+    # the backblast is saved, so a failure from here on must not fail (and retry) the job
+    try:
+        paxminer_log_channel = get_channel_id(name="paxminer_logs", client=client, logger=logger)
+        if paxminer_log_channel:
+            res_link = client.chat_getPermalink(channel=channel, message_ts=backblast_record.timestamp)
             client.chat_postMessage(
-                channel=context["user_id"],
-                text="WARNING: The backblast you just posted was not saved to the database. There is already a "
-                "backblast for this AO and Q on this date. Please edit the backblast using the `Edit this backblast`"
-                "button. Thanks!",
+                channel=paxminer_log_channel,
+                text=f"{log_msg}\nLink: {res_link['permalink']}",
             )
-            print(json.dumps({"event_type": "failed_db_insert", "team_name": region_record.workspace_name}))
+    except Exception as e:
+        logger.error("Error posting to paxminer_logs: {}".format(e))
 
-    for file in file_send_list:
-        try:
-            os.remove(file["filepath"])
-        except Exception as e:
-            logger.error(f"Error removing file: {e}")
+
+def notify_db_save_failed(client: WebClient, context: dict, region_record: Region):
+    client.chat_postMessage(
+        channel=context["user_id"],
+        text="WARNING: The backblast you just posted could not be saved to the database because of an error. "
+        "Please try editing it again using the `Edit this backblast` button. Thanks!",
+    )
+    print(json.dumps({"event_type": "failed_db_insert", "team_name": region_record.workspace_name}))
+
+
+def apply_backblast_edit(
+    tx: DbTransaction,
+    backblast_record: Backblast,
+    attendance_records: List[Attendance],
+    replace_ts: str,
+) -> Dict[str, int]:
+    """Applies an edited backblast to the existing rows for `replace_ts`: the beatdown row is updated in place, and
+    only the attendance delta is written (removed PAX deleted, remaining PAX updated, new PAX inserted).
+
+    Args:
+        tx (DbTransaction): transaction on the region's PAXMiner schema
+        backblast_record (Backblast): the edited beatdown
+        attendance_records (List[Attendance]): the edited attendance list
+        replace_ts (str): timestamp of the backblast being edited
+
+    Returns:
+        Dict[str, int]: counts of attendance rows added, removed and updated
+    """
+    backblast_fields = {k: v for k, v in backblast_record.set_fields().items() if k != "timestamp"}
+    if not tx.update_records(Backblast, [Backblast.timestamp == replace_ts], backblast_fields):
+        # the original was never saved (e.g. its insert failed), so save it now
+        tx.bulk_insert(Backblast, [backblast_record])
+
+    existing_pax = {
+        row.user_id for row in tx.find_values(Attendance, [Attendance.user_id], [Attendance.timestamp == replace_ts])
+    }
+    new_records = {record.user_id: record for record in attendance_records}
+    removed_pax = existing_pax - set(new_records)
+    kept_pax = existing_pax & set(new_records)
+    added_records = [record for user_id, record in new_records.items() if user_id not in existing_pax]
+
+    if removed_pax:
+        tx.delete_records(Attendance, [Attendance.timestamp == replace_ts, Attendance.user_id.in_(list(removed_pax))])
+    if kept_pax:
+        tx.update_records(
+            Attendance,
+            [Attendance.timestamp == replace_ts, Attendance.user_id.in_(list(kept_pax))],
+            {
+                Attendance.ao_id: backblast_record.ao_id,
+                Attendance.date: backblast_record.bd_date,
+                Attendance.q_user_id: backblast_record.q_user_id,
+                Attendance.ts_edited: backblast_record.ts_edited,
+            },
+        )
+    tx.bulk_insert(Attendance, added_records, update_columns=[Attendance.timestamp, Attendance.ts_edited])
+
+    return {
+        "attendance_added": len(added_records),
+        "attendance_removed": len(removed_pax),
+        "attendance_updated": len(kept_pax),
+    }
 
 
 def handle_backblast_edit_button(body: dict, client: WebClient, logger: Logger, context: dict, region_record: Region):
@@ -15,8 +15,9 @@ from utilities.database.orm import (
 )
 from utilities.helper_functions import (
     safe_get,
-    update_local_region_records,
 )
+from utilities.paxminer_directory import invalidate_paxminer_directory
+from utilities.region_cache import refresh_region_record
 from utilities.slack import actions, forms
 
 
@@ -58,6 +59,7 @@ def build_config_email_form(body: dict, client: WebClient, logger: Logger, conte
             actions.CONFIG_EMAIL_PORT: str(region_record.email_server_port or 587),
             actions.CONFIG_EMAIL_PASSWORD: email_password_decrypted,
             actions.CONFIG_POSTIE_ENABLE: "yes" if region_record.postie_format == 1 else "no",
+            actions.CONFIG_EMAIL_ATTACHMENT_LIMIT: str(region_record.email_attachment_limit or ""),
         }
     )
 
@@ -110,6 +112,7 @@ def handle_config_email_post(body: dict, client: WebClient, logger: Logger, cont
             ).decode()
         else:
             email_password_encrypted = None
+        attachment_limit = (safe_get(config_data, actions.CONFIG_EMAIL_ATTACHMENT_LIMIT) or "").strip()
         fields.update(
             {
                 Region.email_option_show: 1 if safe_get(config_data, actions.CONFIG_EMAIL_SHOW_OPTION) == "yes" else 0,
@@ -119,6 +122,7 @@ def handle_config_email_post(body: dict, client: WebClient, logger: Logger, cont
                 Region.email_to: safe_get(config_data, actions.CONFIG_EMAIL_TO),
                 Region.email_password: email_password_encrypted,
                 Region.postie_format: 1 if safe_get(config_data, actions.CONFIG_POSTIE_ENABLE) == "yes" else 0,
+                Region.email_attachment_limit: int(attachment_limit) if attachment_limit.isdigit() else None,
             }
         )
 
@@ -127,7 +131,7 @@ def handle_config_email_post(body: dict, client: WebClient, logger: Logger, cont
         id=context["team_id"],
         fields=fields,
     )
-    update_local_region_records()
+    refresh_region_record(region_record.team_id)
     print(json.dumps({"event_type": "successful_config_update", "team_name": region_record.workspace_name}))
 
 
@@ -147,7 +151,7 @@ def handle_config_general_post(body: dict, client: WebClient, logger: Logger, co
         id=context["team_id"],
         fields=fields,
     )
-    update_local_region_records()
+    refresh_region_record(region_record.team_id)
     print(json.dumps({"event_type": "successful_config_update", "team_name": region_record.workspace_name}))
 
 
@@ -239,20 +243,20 @@ def handle_config_paxminer_post(body: dict, client: WebClient, logger: Logger, c
 
     report_channels = safe_get(config_data, actions.CONFIG_PAXMINER_REPORT_CHANNELS) or []
 
-    # if not in report, set backblast to 0
-    DbManager.update_records(
-        cls=PaxminerAO,
-        filters=[PaxminerAO.channel_id.not_in(report_channels)],
-        fields={PaxminerAO.backblast: 0},
-        schema=region_record.paxminer_schema,
-    )
+    with DbManager.transaction(schema=region_record.paxminer_schema) as tx:
+        # if not in report, set backblast to 0
+        tx.update_records(
+            cls=PaxminerAO,
+            filters=[PaxminerAO.channel_id.not_in(report_channels)],
+            fields={PaxminerAO.backblast: 0},
+        )
 
-    # if in report, set backblast to 1
-    DbManager.update_records(
-        cls=PaxminerAO,
-        filters=[PaxminerAO.channel_id.in_(report_channels)],
-        fields={PaxminerAO.backblast: 1},
-        schema=region_record.paxminer_schema,
-    )
+        # if in report, set backblast to 1
+        tx.update_records(
+            cls=PaxminerAO,
+            filters=[PaxminerAO.channel_id.in_(report_channels)],
+            fields={PaxminerAO.backblast: 1},
+        )
+    invalidate_paxminer_directory(region_record.paxminer_schema)
 
     print(json.dumps({"event_type": "successful_config_update", "team_name": region_record.workspace_name}))
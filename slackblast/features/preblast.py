@@ -6,13 +6,13 @@ from logging import Logger
 import pytz
 from slack_sdk.web import WebClient
 
-from utilities.database import DbManager
-from utilities.database.orm import PaxminerUser, Region
+from utilities.database.orm import Region
 from utilities.helper_functions import (
     get_user_names,
     remove_keys_from_dict,
     safe_get,
 )
+from utilities.paxminer_directory import get_paxminer_directory
 from utilities.slack import actions, forms
 from utilities.slack import orm as slack_orm
 
@@ -94,7 +94,7 @@ def handle_preblast_post(body: dict, client: WebClient, logger: Logger, context:
 
     user_records = None
     if region_record.paxminer_schema:
-        user_records = DbManager.find_records(PaxminerUser, filters=[True], schema=region_record.paxminer_schema)
+        user_records = get_paxminer_directory(region_record.paxminer_schema).users
 
     chan = destination
     if chan == "The_AO":
@@ -9,7 +9,7 @@ import requests
 from requests_oauthlib import OAuth2Session
 from slack_sdk import WebClient
 
-from utilities import constants
+from utilities import constants, tracing
 from utilities.database import DbManager
 from utilities.database.orm import Region, User
 from utilities.helper_functions import parse_rich_block, replace_user_channel_ids, safe_get
@@ -239,6 +239,7 @@ def strava_exchange_token(event, context) -> dict:
     return r
 
 
+@tracing.traced("strava.refresh_token")
 def check_and_refresh_strava_token(user_record: User) -> str:
     """Check if a Strava token is expired and refresh it if necessary."""
     if not user_record.strava_access_token:
@@ -273,6 +274,7 @@ def check_and_refresh_strava_token(user_record: User) -> str:
     return access_token
 
 
+@tracing.traced("strava.get_activities")
 def get_strava_activities(user_record: User) -> List[Dict]:
     """Get a list of Strava activities for a user."""
     if not user_record.strava_access_token:
@@ -286,6 +288,7 @@ def get_strava_activities(user_record: User) -> List[Dict]:
     return data
 
 
+@tracing.traced("strava.update_activity")
 def update_strava_activity(
     strava_activity_id: str,
     user_id: str,
@@ -327,6 +330,7 @@ def update_strava_activity(
     return data
 
 
+@tracing.traced("strava.get_activity")
 def get_strava_activity(
     strava_activity_id: str,
     user_id: str,
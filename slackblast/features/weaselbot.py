@@ -15,8 +15,8 @@ from utilities.database.orm import (
 )
 from utilities.helper_functions import (
     safe_get,
-    update_local_region_records,
 )
+from utilities.region_cache import refresh_region_record
 from utilities.slack import actions, forms
 from utilities.slack import orm as slack_orm
 
@@ -32,7 +32,12 @@ def build_achievement_form(body: dict, client: WebClient, logger: Logger, contex
     # gather achievements from paxminer
     if paxminer_schema:
         try:
-            achievement_list = DbManager.find_records(schema=paxminer_schema, cls=AchievementsList, filters=[True])
+            achievement_list = DbManager.find_values(
+                schema=paxminer_schema,
+                cls=AchievementsList,
+                columns=[AchievementsList.id, AchievementsList.name, AchievementsList.description],
+                filters=[True],
+            )
         except ProgrammingError:
             error_form = copy.deepcopy(forms.ERROR_FORM)
             error_msg = constants.ERROR_FORM_MESSAGE_TEMPLATE.format(
@@ -90,9 +95,10 @@ def handle_achievements_tag(body: dict, client: WebClient, logger: Logger, conte
     achievement_verb = achievement_info.verb
 
     # Get all achievements for the year
-    pax_awards = DbManager.find_records(
+    pax_awards = DbManager.find_values(
         schema=region_record.paxminer_schema,
         cls=AchievementsAwarded,
+        columns=[AchievementsAwarded.pax_id, AchievementsAwarded.achievement_id],
         filters=[
             AchievementsAwarded.pax_id.in_(achievement_pax_list),
             AchievementsAwarded.date_awarded >= datetime(achievement_date.year, 1, 1),
@@ -204,4 +210,4 @@ def handle_config_form(body: dict, client: WebClient, logger: Logger, context: d
         id=context["team_id"],
         fields=fields,
     )
-    update_local_region_records()
+    refresh_region_record(region_record.team_id)
@@ -12,8 +12,8 @@ from utilities.database.orm import (
 )
 from utilities.helper_functions import (
     safe_get,
-    update_local_region_records,
 )
+from utilities.region_cache import refresh_region_record
 from utilities.slack import actions, forms
 
 
@@ -80,7 +80,7 @@ def handle_welcome_message_config_post(
         id=context["team_id"],
         fields=fields,
     )
-    update_local_region_records()
+    refresh_region_record(region_record.team_id)
     print(json.dumps({"event_type": "successful_config_update", "team_name": region_record.workspace_name}))
 
 
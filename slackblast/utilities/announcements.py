@@ -1,12 +1,28 @@
 # A quick script to make announcements (changelogs, etc) to Slack
+#
+# `/send-announcement dry-run` reports which regions would get the message, `/send-announcement confirm` sends it.
+# Deliveries are recorded in a journal keyed by the message, so re-running the same announcement after a crash or
+# timeout only sends to the regions that haven't had it yet. ANNOUNCEMENT_JOURNAL_PATH sets where it lives, either a
+# file path or an s3://bucket/key URL. Left unset, a local run uses a file in /tmp and the deployed app uses an object
+# in the Slack state bucket, since Lambda's /tmp does not outlive the execution environment.
+import hashlib
+import json
+import os
 import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
 from logging import Logger
-from typing import List
+from threading import Lock
+from typing import Any, Dict, List, Optional
 
+from botocore.exceptions import ClientError
 from slack_sdk import WebClient
+from slack_sdk.errors import SlackApiError
 
+from utilities import constants, tracing
 from utilities.database import DbManager
 from utilities.database.orm import PaxminerRegion, Region
+from utilities.image_pipeline import get_s3_client
 
 msg = "Hello, {region}! This is Moneyball, lead developer of the Slackblast app. I wanted to make you aware of a couple known issues in Slack right now that probably has affected your slackblast usage:\n\n"
 msg += ":warning: *Tagging* - Particularly on Android phones, you've probably noticed that you can only tag other PAX with their full name, not their display / F3 name\n\n"
@@ -16,30 +32,262 @@ msg += "\n~ :moneybag: :baseball:"
 msg += "\n\nPS don't forget to tune in to the F3 Nation State of the Nation tonight at 8pm EST! There will be some info on a lot of cool stuff happening in the F3 tech space that you won't want to miss: https://f3nation.com/sotn"
 
 
+class TokenBucket:
+    """Limits callers to `rate` calls per second, with bursts of up to `capacity`. pause() holds every caller until a
+    Retry-After has passed."""
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self.lock = Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                if now < self.paused_until:
+                    wait = self.paused_until - now
+                else:
+                    self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                    self.updated = now
+                    if self.tokens >= 1:
+                        self.tokens -= 1
+                        return
+                    wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def pause(self, seconds: float):
+        with self.lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+            self.updated = self.paused_until
+            self.tokens = 1
+
+
+WORKSPACE_BUCKETS: Dict[str, TokenBucket] = {}
+WORKSPACE_BUCKETS_LOCK = Lock()
+
+
+def get_workspace_bucket(team_id: str) -> TokenBucket:
+    with WORKSPACE_BUCKETS_LOCK:
+        if team_id not in WORKSPACE_BUCKETS:
+            WORKSPACE_BUCKETS[team_id] = TokenBucket(
+                constants.ANNOUNCEMENT_RATE_PER_SECOND, constants.ANNOUNCEMENT_BURST
+            )
+        return WORKSPACE_BUCKETS[team_id]
+
+
+class DeliveryJournal:
+    """Records which teams have received a message, rewriting the whole journal after every delivery. A journal
+    written for a different message is ignored, so each new announcement starts from scratch. Subclasses say where
+    the journal is stored."""
+
+    def __init__(self, message: str):
+        self.message_hash = hashlib.sha256(message.encode()).hexdigest()
+        self.delivered: Dict[str, str] = {}
+        self.lock = Lock()
+        journal = self.read()
+        if journal and journal.get("message_hash") == self.message_hash:
+            self.delivered = journal.get("delivered") or {}
+
+    def read(self) -> Optional[Dict[str, Any]]:
+        raise NotImplementedError
+
+    def write(self, journal: Dict[str, Any]):
+        raise NotImplementedError
+
+    def is_delivered(self, team_id: str) -> bool:
+        return team_id in self.delivered
+
+    def record(self, team_id: str, ts: str):
+        with self.lock:
+            self.delivered[team_id] = ts
+            self.write({"message_hash": self.message_hash, "delivered": self.delivered})
+
+
+class FileDeliveryJournal(DeliveryJournal):
+    """Keeps the journal in a local file. Only durable for a local run; Lambda's /tmp is lost with its environment."""
+
+    def __init__(self, path: str, message: str):
+        self.path = path
+        super().__init__(message)
+
+    def read(self) -> Optional[Dict[str, Any]]:
+        if not os.path.exists(self.path):
+            return None
+        with open(self.path) as f:
+            return json.load(f)
+
+    def write(self, journal: Dict[str, Any]):
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, "w") as f:
+            json.dump(journal, f)
+        os.replace(temp_path, self.path)
+
+
+class S3DeliveryJournal(DeliveryJournal):
+    """Keeps the journal in an S3 object, so a resumed announcement sees it from any Lambda invocation."""
+
+    def __init__(self, bucket: str, key: str, message: str):
+        self.bucket = bucket
+        self.key = key
+        super().__init__(message)
+
+    def read(self) -> Optional[Dict[str, Any]]:
+        try:
+            response = get_s3_client().get_object(Bucket=self.bucket, Key=self.key)
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("NoSuchKey", "404"):
+                return None
+            raise
+        return json.loads(response["Body"].read())
+
+    def write(self, journal: Dict[str, Any]):
+        get_s3_client().put_object(
+            Bucket=self.bucket, Key=self.key, Body=json.dumps(journal).encode(), ContentType="application/json"
+        )
+
+
+def get_journal(message: str, journal_path: str = None) -> DeliveryJournal:
+    """Opens the delivery journal at `journal_path`, a file path or an s3://bucket/key URL. Defaults to
+    ANNOUNCEMENT_JOURNAL_PATH from the environment, then to a /tmp file for a local run or an object in the Slack
+    state bucket when deployed."""
+    journal_path = journal_path or os.environ.get(constants.ANNOUNCEMENT_JOURNAL_PATH)
+    if not journal_path:
+        if constants.LOCAL_DEVELOPMENT:
+            journal_path = constants.ANNOUNCEMENT_DEFAULT_JOURNAL_PATH
+        else:
+            bucket = os.environ[constants.SLACK_STATE_S3_BUCKET_NAME]
+            journal_path = f"s3://{bucket}/{constants.ANNOUNCEMENT_JOURNAL_S3_KEY}"
+    if journal_path.startswith("s3://"):
+        bucket, _, key = journal_path[len("s3://") :].partition("/")
+        return S3DeliveryJournal(bucket, key, message)
+    return FileDeliveryJournal(journal_path, message)
+
+
+@dataclass
+class Delivery:
+    team_id: str
+    workspace_name: str
+    channel: str
+    bot_token: str = field(repr=False)
+    status: str = "pending"
+    error: str = None
+    attempts: int = 0
+
+
+def get_deliveries() -> List[Delivery]:
+    """Returns one delivery per region that has a bot token and a PAXMiner schema with a 1st F channel."""
+    region_records: List[Region] = DbManager.find_records(Region, filters=[True])
+    paxminer_regions: List[PaxminerRegion] = DbManager.find_records(PaxminerRegion, filters=[True], schema="paxminer")
+    paxminer_dict = {region.schema_name: region.firstf_channel for region in paxminer_regions}
+
+    return [
+        Delivery(
+            team_id=region.team_id,
+            workspace_name=region.workspace_name,
+            channel=paxminer_dict[region.paxminer_schema],
+            bot_token=region.bot_token,
+        )
+        for region in region_records
+        if region.bot_token and paxminer_dict.get(region.paxminer_schema)
+    ]
+
+
+def deliver(delivery: Delivery, message: str, journal: DeliveryJournal, logger: Logger) -> Delivery:
+    client = WebClient(token=delivery.bot_token)
+    bucket = get_workspace_bucket(delivery.team_id)
+    for attempt in range(constants.SLACK_MAX_RETRIES + 1):
+        bucket.acquire()
+        delivery.attempts += 1
+        try:
+            response = client.chat_postMessage(
+                channel=delivery.channel, text=message.format(region=delivery.workspace_name)
+            )
+        except SlackApiError as e:
+            if e.response.status_code == 429 and attempt < constants.SLACK_MAX_RETRIES:
+                headers = {k.lower(): v for k, v in (e.response.headers or {}).items()}
+                retry_after = int(headers.get("retry-after", 1))
+                logger.warning(f"Rate limited sending to {delivery.workspace_name}, retrying in {retry_after}s")
+                bucket.pause(retry_after)
+                continue
+            delivery.status = "failed"
+            delivery.error = e.response.get("error")
+            return delivery
+        except Exception as e:
+            delivery.status = "failed"
+            delivery.error = str(e)
+            return delivery
+
+        # the message is out, so a journal error must not turn this into a failure (and a resend on resume)
+        delivery.status = "sent"
+        try:
+            journal.record(delivery.team_id, response.get("ts"))
+        except Exception as e:
+            logger.error(f"Sent to {delivery.workspace_name} but could not record it in the journal: {e}")
+        return delivery
+
+
+def broadcast(
+    message: str,
+    deliveries: List[Delivery],
+    logger: Logger,
+    dry_run: bool = False,
+    journal_path: str = None,
+    max_workers: int = constants.ANNOUNCEMENT_MAX_WORKERS,
+) -> Dict[str, Any]:
+    """Sends a message to many workspaces concurrently, skipping any the journal says already have it.
+
+    Args:
+        message (str): message template, formatted with the workspace name as `{region}`
+        deliveries (List[Delivery]): where to send it
+        logger (Logger): logger
+        dry_run (bool, optional): only report what would be sent. Defaults to False.
+        journal_path (str, optional): delivery journal file or s3://bucket/key URL. Defaults as in get_journal.
+        max_workers (int, optional): concurrent sends. Defaults to ANNOUNCEMENT_MAX_WORKERS.
+
+    Returns:
+        Dict[str, Any]: the delivery report
+    """
+    start = time.perf_counter()
+    journal = get_journal(message, journal_path)
+
+    pending = []
+    for delivery in deliveries:
+        if journal.is_delivered(delivery.team_id):
+            delivery.status = "already_sent"
+        elif dry_run:
+            delivery.status = "dry_run"
+        else:
+            pending.append(delivery)
+
+    if pending:
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(pending))) as executor:
+            list(executor.map(tracing.propagate(lambda delivery: deliver(delivery, message, journal, logger)), pending))
+
+    counts: Dict[str, int] = {}
+    for delivery in deliveries:
+        counts[delivery.status] = counts.get(delivery.status, 0) + 1
+    report = {
+        "event_type": "announcement_report",
+        "dry_run": dry_run,
+        "regions": len(deliveries),
+        "statuses": counts,
+        "failures": [
+            {"team_id": d.team_id, "workspace_name": d.workspace_name, "error": d.error}
+            for d in deliveries
+            if d.status == "failed"
+        ],
+        "elapsed": round(time.perf_counter() - start, 3),
+    }
+    if dry_run:
+        report["recipients"] = [d.workspace_name for d in deliveries if d.status == "dry_run"]
+    print(json.dumps(report))
+    return report
+
+
 def send(client: WebClient, body: dict, logger: Logger, context: dict, region_record: Region):
-    if body.get("text") == "confirm":
-        region_records: List[Region] = DbManager.find_records(Region, filters=[True])
-        paxminer_regions = DbManager.find_records(PaxminerRegion, filters=[True], schema="paxminer")
-        paxminer_dict = {region.schema_name: region.firstf_channel for region in paxminer_regions}
-
-        for region in region_records:
-            if region.paxminer_schema:
-                send_channel = paxminer_dict.get(region.paxminer_schema)
-                if send_channel:
-                    print(f"Sending message to {region.workspace_name}")
-                    client = WebClient(token=region.bot_token)
-                    try:
-                        client.chat_postMessage(channel=send_channel, text=msg.format(region=region.workspace_name))
-                        print("Message sent!")
-                    except Exception as e:
-                        if e.response.get("error") == "ratelimited":
-                            print("Rate limited, waiting 10 seconds")
-                            time.sleep(10)
-                            try:
-                                client.chat_postMessage(
-                                    channel=send_channel, text=msg.format(region=region.workspace_name)
-                                )
-                                print("Message sent!")
-                            except Exception as e:
-                                print(f"Error sending message to {region.workspace_name}: {e}")
-                        print(f"Error sending message to {region.workspace_name}: {e}")
+    if body.get("text") in ("confirm", "dry-run"):
+        broadcast(msg, get_deliveries(), logger, dry_run=body.get("text") == "dry-run")
@@ -16,6 +16,30 @@ ADMIN_DATABASE_SCHEMA = "ADMIN_DATABASE_SCHEMA"
 STRAVA_CLIENT_ID = "STRAVA_CLIENT_ID"
 STRAVA_CLIENT_SECRET = "STRAVA_CLIENT_SECRET"
 
+DATABASE_POOL_SIZE = 2
+DATABASE_POOL_MAX_OVERFLOW = 3
+DATABASE_POOL_RECYCLE = 280
+FANOUT_MAX_WORKERS = DATABASE_POOL_SIZE + DATABASE_POOL_MAX_OVERFLOW
+
+PAXMINER_DIRECTORY_TTL = 600
+PAXMINER_DIRECTORY_MAX_REGIONS = 25
+
+PAXMINER_DISCOVERY_MAX_WORKERS = 8
+PAXMINER_DISCOVERY_MAX_REGIONS = 8  # per discovery job, so one job stays well inside the Lambda timeout
+PAXMINER_DISCOVERY_TIMEOUT = 3
+PAXMINER_DISCOVERY_RETRY_AFTER_DAYS = 7
+
+REGION_CACHE_TTL = 60
+REGION_CACHE_MAX_AGE = 3600
+
+SLACK_DIRECTORY_TTL = 900
+SLACK_DIRECTORY_MAX_WORKSPACES = 10
+SLACK_DIRECTORY_FAILURE_BACKOFF = 60
+SLACK_CHANNEL_MISS_REFRESH = 120
+SLACK_LIST_PAGE_SIZE = 1000
+SLACK_MAX_WORKERS = 8
+SLACK_MAX_RETRIES = 3
+
 LOCAL_DEVELOPMENT = os.environ.get(SLACK_BOT_TOKEN, "123") != "123"
 
 SLACK_STATE_S3_BUCKET_NAME = "ENV_SLACK_STATE_S3_BUCKET_NAME"
@@ -114,6 +138,33 @@ DEFAULT_PREBLAST_MOLESKINE_TEMPLATE = {
 
 STATE_METADATA = "STATE_METADATA"
 
+JOB_QUEUE_BACKEND = "JOB_QUEUE_BACKEND"
+JOB_QUEUE_SQLITE_PATH = "JOB_QUEUE_SQLITE_PATH"
+JOB_MAX_ATTEMPTS = 3
+JOB_RETRY_BACKOFF = 1
+
+SMTP_TIMEOUT = 30
+SMTP_IDLE_TIMEOUT = 120
+EMAIL_ATTACHMENT_LIMIT = 10 * 1024 * 1024
+
+REQUEST_LOG_SAMPLE_RATE = "REQUEST_LOG_SAMPLE_RATE"
+REQUEST_LOG_ROUTE_SAMPLE_RATES = "REQUEST_LOG_ROUTE_SAMPLE_RATES"
+REQUEST_LOG_DEFAULT_SAMPLE_RATE = 0.05
+REQUEST_LOG_MAX_BYTES = 4096
+REQUEST_LOG_MAX_STRING_LENGTH = 256
+REQUEST_LOG_REDACTED_FIELDS = {"token", "response_url", "response_urls", "trigger_id", "hash", "email_password"}
+
+ROUTE_STATS_INTERVAL = 300
+
+ANNOUNCEMENT_JOURNAL_PATH = "ANNOUNCEMENT_JOURNAL_PATH"
+# a local file only survives a local run; on Lambda /tmp goes away with the execution environment, so the journal
+# defaults to an object in the Slack state bucket instead
+ANNOUNCEMENT_DEFAULT_JOURNAL_PATH = "/tmp/announcement_journal.json"
+ANNOUNCEMENT_JOURNAL_S3_KEY = "announcements/journal.json"
+ANNOUNCEMENT_MAX_WORKERS = 16
+ANNOUNCEMENT_RATE_PER_SECOND = 1  # chat.postMessage allows about one message per second per channel
+ANNOUNCEMENT_BURST = 1
+
 AWS_ACCESS_KEY_ID = "AWS_ACCESS_KEY_ID"
 AWS_SECRET_ACCESS_KEY = "AWS_SECRET_ACCESS_KEY"
 
@@ -128,6 +179,13 @@ WELCOME_MESSAGE_TEMPLATES = [
 
 MAX_HEIC_SIZE = 1000
 LOW_REZ_IMAGE_SIZE = 1000
+IMAGE_PIPELINE_MAX_WORKERS = 4
+IMAGE_UPLOAD_CHUNK_SIZE = 5 * 1024 * 1024  # S3 multipart parts must be at least 5MB
+IMAGE_UPLOAD_MAX_CONCURRENCY = 2
+# a non-seekable stream buffers up to this many chunks; with the worker count above the worst case is
+# 4 workers * 2 chunks * 5MB = 40MB, well under the 128MB Lambda
+IMAGE_UPLOAD_MAX_IN_MEMORY_CHUNKS = 2
+IMAGE_DOWNLOAD_CHUNK_SIZE = 1024 * 1024
 
 ERROR_FORM_MESSAGE_TEMPLATE = ":warning: Sorry, the following error occurred:\n\n```{error}```"
 
@@ -1,12 +1,16 @@
 import os
+import time
+from contextlib import contextmanager
 from dataclasses import dataclass
-from typing import List, TypeVar
+from threading import Lock
+from typing import Any, Dict, Iterator, List, Tuple, TypeVar, Union
 
-from sqlalchemy import and_, create_engine, pool
-from sqlalchemy.engine import Engine
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy import and_, create_engine, event, literal, or_, pool, select
+from sqlalchemy.dialects.mysql import insert
+from sqlalchemy.engine import Engine, Row
+from sqlalchemy.orm import Session, sessionmaker
 
-from utilities import constants
+from utilities import constants, tracing
 from utilities.database.orm import BaseClass
 
 
@@ -16,43 +20,181 @@ class DatabaseField:
     value: object = None
 
 
-GLOBAL_ENGINE = None
-GLOBAL_SESSION = None
-GLOBAL_SCHEMA = None
+# one engine (and connection pool) per echo setting; every schema lives on the same server, so schemas share it
+ENGINES: Dict[bool, Engine] = {}
+ENGINES_LOCK = Lock()
+ENGINE_STATS: Dict[str, Dict[str, int]] = {}
+
+
+def _track_engine_stats(engine: Engine, database: str):
+    stats = ENGINE_STATS.setdefault(database, {"connects": 0, "checkouts": 0})
+
+    @event.listens_for(engine, "connect")
+    def on_connect(dbapi_connection, connection_record):
+        stats["connects"] += 1
+
+    @event.listens_for(engine, "checkout")
+    def on_checkout(dbapi_connection, connection_record, connection_proxy):
+        stats["checkouts"] += 1
+
+
+def _trace_queries(engine: Engine, database: str):
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_start"].pop()
+        schema = (conn.get_execution_options().get("schema_translate_map") or {}).get(None, database)
+        tracing.record_span("db.query", elapsed, schema=schema, statement=statement.split(None, 1)[0].upper())
 
 
 def get_engine(echo=False, schema=None) -> Engine:
-    host = os.environ[constants.DATABASE_HOST]
-    user = os.environ[constants.ADMIN_DATABASE_USER]
-    passwd = os.environ[constants.ADMIN_DATABASE_PASSWORD]
-    database = schema or os.environ[constants.ADMIN_DATABASE_SCHEMA]
-    db_url = f"mysql+pymysql://{user}:{passwd}@{host}:3306/{database}?charset=utf8mb4"
-    return create_engine(db_url, echo=echo, poolclass=pool.NullPool)
+    """Returns the pooled engine for the database server, pointed at the given schema.
 
+    The server engine is created on first use and kept in a module-level registry, so that the connection pool
+    survives across DbManager calls and warm Lambda invocations. Rather than an engine (and pool) per schema, a
+    schema other than the admin schema is selected with schema_translate_map, which qualifies the ORM's unqualified
+    tables (beatdowns, bd_attendance, ...) on the shared pool's connections.
+    """
+    database = os.environ[constants.ADMIN_DATABASE_SCHEMA]
+    with ENGINES_LOCK:
+        engine = ENGINES.get(echo)
+        if not engine:
+            host = os.environ[constants.DATABASE_HOST]
+            user = os.environ[constants.ADMIN_DATABASE_USER]
+            passwd = os.environ[constants.ADMIN_DATABASE_PASSWORD]
+            db_url = f"mysql+pymysql://{user}:{passwd}@{host}:3306/{database}?charset=utf8mb4"
+            engine = create_engine(
+                db_url,
+                echo=echo,
+                poolclass=pool.QueuePool,
+                pool_size=constants.DATABASE_POOL_SIZE,
+                max_overflow=constants.DATABASE_POOL_MAX_OVERFLOW,
+                pool_recycle=constants.DATABASE_POOL_RECYCLE,
+                pool_pre_ping=True,
+            )
+            _track_engine_stats(engine, database)
+            _trace_queries(engine, database)
+            ENGINES[echo] = engine
+
+    if schema and schema != database:
+        return engine.execution_options(schema_translate_map={None: schema})
+    return engine
 
-def get_session(echo=False, schema=None):
-    if GLOBAL_SESSION:
-        return GLOBAL_SESSION
 
-    global GLOBAL_ENGINE, GLOBAL_SCHEMA
-    if schema != GLOBAL_SCHEMA or not GLOBAL_ENGINE:
-        GLOBAL_ENGINE = get_engine(echo=echo, schema=schema)
-        GLOBAL_SCHEMA = schema or os.environ[constants.ADMIN_DATABASE_SCHEMA]
-    return sessionmaker()(bind=GLOBAL_ENGINE)
+def get_engine_stats() -> Dict[str, Dict[str, int]]:
+    """Returns connection stats for the server's pool, keyed by the admin database: new connections opened, total
+    checkouts, and checkouts that reused a pooled connection."""
+    return {
+        database: {**stats, "reused": stats["checkouts"] - stats["connects"]}
+        for database, stats in ENGINE_STATS.items()
+    }
+
+
+def dispose_engines():
+    with ENGINES_LOCK:
+        engines = list(ENGINES.values())
+        ENGINES.clear()
+    for engine in engines:
+        engine.dispose()
+
+
+def get_session(echo=False, schema=None):
+    return sessionmaker()(bind=get_engine(echo=echo, schema=schema))
 
 
 def close_session(session):
-    global GLOBAL_SESSION, GLOBAL_ENGINE
-    if GLOBAL_SESSION == session:
-        if GLOBAL_ENGINE:
-            GLOBAL_ENGINE.close()
-            GLOBAL_SESSION = None
+    session.close()
 
 
 T = TypeVar("T")
 
 
+def _bulk_insert_statement(cls: T, records: List[Union[BaseClass, Dict[str, Any]]], update_columns=None):
+    rows = [record if isinstance(record, dict) else record.set_fields() for record in records]
+    statement = insert(cls).values(rows)
+    if update_columns:
+        statement = statement.on_duplicate_key_update({c.key: statement.inserted[c.key] for c in update_columns})
+    return statement
+
+
+class DbTransaction:
+    """Unit of work bound to a single session. Obtain one through `DbManager.transaction`; everything done through it
+    shares one connection and is committed (or rolled back) together when the context exits."""
+
+    def __init__(self, session: Session):
+        self.session = session
+
+    def get_record(self, cls: T, id) -> T:
+        x = self.session.query(cls).filter(cls.get_id() == id).first()
+        if x:
+            self.session.expunge(x)
+        return x
+
+    def find_records(self, cls: T, filters) -> List[T]:
+        records = self.session.query(cls).filter(and_(*filters)).all()
+        for r in records:
+            self.session.expunge(r)
+        return records
+
+    def find_values(self, cls: T, columns, filters) -> List[Row]:
+        return self.session.execute(select(*columns).select_from(cls).where(and_(*filters))).all()
+
+    def update_record(self, cls: T, id, fields):
+        self.session.query(cls).filter(cls.get_id() == id).update(fields, synchronize_session="fetch")
+        self.session.flush()
+
+    def update_records(self, cls: T, filters, fields) -> int:
+        count = self.session.query(cls).filter(and_(*filters)).update(fields, synchronize_session="fetch")
+        self.session.flush()
+        return count
+
+    def create_record(self, record: BaseClass) -> BaseClass:
+        self.session.add(record)
+        self.session.flush()
+        self.session.expunge(record)
+        return record
+
+    def create_records(self, records: List[BaseClass]):
+        self.session.add_all(records)
+        self.session.flush()
+
+    def bulk_insert(self, cls: T, records: List[Union[BaseClass, Dict[str, Any]]], update_columns=None) -> int:
+        if not records:
+            return 0
+        return self.session.execute(_bulk_insert_statement(cls, records, update_columns)).rowcount
+
+    def delete_record(self, cls: T, id):
+        self.session.query(cls).filter(cls.get_id() == id).delete()
+        self.session.flush()
+
+    def delete_records(self, cls: T, filters):
+        self.session.query(cls).filter(and_(*filters)).delete()
+        self.session.flush()
+
+
 class DbManager:
+    @contextmanager
+    def transaction(schema=None) -> Iterator[DbTransaction]:
+        """Groups several reads and writes against one schema into a single connection and commit.
+
+        Usage:
+            with DbManager.transaction(schema=region_record.paxminer_schema) as tx:
+                tx.delete_records(Backblast, filters=[Backblast.timestamp == ts])
+                tx.create_record(Backblast(...))
+        """
+        session = get_session(schema=schema)
+        try:
+            yield DbTransaction(session)
+            session.commit()
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            close_session(session)
+
     def get_record(cls: T, id, schema=None) -> T:
         session = get_session(schema=schema)
         try:
@@ -64,6 +206,60 @@ class DbManager:
             session.rollback()
             close_session(session)
 
+    def find_values(cls: T, columns, filters, schema=None, as_dict=False) -> List[Row]:
+        """Reads only the given columns of the matching records. Rows come back as lightweight named tuples (or
+        dicts) instead of ORM entities, so large columns that aren't asked for are never transferred or mapped.
+
+        Usage:
+            rows = DbManager.find_values(PaxminerUser, [PaxminerUser.user_id, PaxminerUser.user_name], filters=[True])
+            rows[0].user_name
+
+        Args:
+            cls (T): ORM class to select from
+            columns (list): columns to return, e.g. [Backblast.timestamp, Backblast.bd_date]
+            filters (list): filters, as for find_records
+            schema (str, optional): schema to query. Defaults to the admin schema.
+            as_dict (bool, optional): return dicts instead of named tuples. Defaults to False.
+
+        Returns:
+            List[Row]: the matching rows
+        """
+        session = get_session(schema=schema)
+        try:
+            rows = session.execute(select(*columns).select_from(cls).where(and_(*filters))).all()
+            return [row._asdict() for row in rows] if as_dict else rows
+        finally:
+            session.rollback()
+            close_session(session)
+
+    def get_value(cls: T, id, column, schema=None):
+        """Reads a single column of a single record, without loading the rest of the row."""
+        session = get_session(schema=schema)
+        try:
+            return session.query(column).filter(cls.get_id() == id).scalar()
+        finally:
+            session.rollback()
+            close_session(session)
+
+    def exists(checks: List[Tuple[BaseClass, list]], schema=None) -> bool:
+        """Checks whether any of several tables has a row matching its filters, in a single
+        `SELECT EXISTS(...) OR EXISTS(...)` round trip that never transfers row data.
+
+        Args:
+            checks (List[Tuple[BaseClass, list]]): (ORM class, filters) pairs
+            schema (str, optional): schema to query. Defaults to the admin schema.
+
+        Returns:
+            bool: True if at least one check matched a row
+        """
+        session = get_session(schema=schema)
+        try:
+            clauses = [select(literal(1)).select_from(cls).where(and_(*filters)).exists() for cls, filters in checks]
+            return bool(session.execute(select(or_(*clauses))).scalar())
+        finally:
+            session.rollback()
+            close_session(session)
+
     def find_records(cls: T, filters, schema=None) -> List[T]:
         session = get_session(schema=schema)
         try:
@@ -113,6 +309,33 @@ class DbManager:
             session.commit()
             close_session(session)
 
+    def bulk_insert(cls: T, records: List[Union[BaseClass, Dict[str, Any]]], update_columns=None, schema=None) -> int:
+        """Writes many rows with a single multi-row INSERT, skipping the ORM unit of work. Only the columns set on
+        an ORM instance are written (the rest get the table's defaults), so every record should set the same columns.
+
+        Args:
+            cls (T): ORM class of the table to insert into
+            records (List[Union[BaseClass, Dict[str, Any]]]): ORM instances or column -> value dicts
+            update_columns (list, optional): if given, rows that hit an existing key update these columns instead
+                (INSERT ... ON DUPLICATE KEY UPDATE); otherwise a duplicate key raises
+            schema (str, optional): schema to write to. Defaults to the admin schema.
+
+        Returns:
+            int: affected rows, as reported by MySQL (1 per inserted row, 2 per updated row)
+        """
+        if not records:
+            return 0
+        session = get_session(schema=schema)
+        try:
+            rowcount = session.execute(_bulk_insert_statement(cls, records, update_columns)).rowcount
+            session.commit()
+            return rowcount
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            close_session(session)
+
     def delete_record(cls: T, id, schema=None):
         session = get_session(schema=schema)
         try:
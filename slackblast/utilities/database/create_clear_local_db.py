@@ -12,6 +12,7 @@ from sqlalchemy.engine import Engine
 from sqlalchemy_utils import create_database, database_exists
 
 from utilities.database import get_engine, get_session, orm
+from utilities.database.migrations import explain_hot_queries
 
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
@@ -23,7 +24,7 @@ def create_tables():
     logger.info("Creating schemas and tables...")
 
     schema_table_map = {
-        "slackblast": [orm.Region, orm.User],
+        "slackblast": [orm.Region, orm.User, orm.PaxminerSchemaMapping, orm.PaxminerDiscoveryFailure],
         "f3devregion": [
             orm.Backblast,
             orm.Attendance,
@@ -38,11 +39,11 @@ def create_tables():
     for schema, tables in schema_table_map.items():
         tables = [t.__table__ for t in tables]
         engine: Engine = get_engine(schema=schema)
-        if not database_exists(engine.url):
-            create_database(engine.url)
-        with engine.connect() as conn:
+        schema_url = engine.url.set(database=schema)
+        if not database_exists(schema_url):
+            create_database(schema_url)
+        with engine.begin() as conn:
             orm.BaseClass.metadata.create_all(bind=conn, tables=tables)
-        engine.dispose()
 
     logger.info("Schemas and tables created!")
 
@@ -135,3 +136,4 @@ if __name__ == "__main__":
     drop_database()
     create_tables()
     initialize_tables()
+    explain_hot_queries("f3devregion")
@@ -43,11 +43,31 @@ CREATE TABLE slackblast.`regions` (
   `email_password` longtext CHARACTER SET utf8 COLLATE utf8_general_ci,
   `email_to` varchar(100) DEFAULT NULL,
   `email_option_show` tinyint(1) DEFAULT 0,
+  `email_attachment_limit` int DEFAULT NULL,
   `postie_format` tinyint(1) DEFAULT 1,
   `created` datetime NOT NULL DEFAULT CURRENT_TIMESTAMP,
   `updated` datetime NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
   PRIMARY KEY (`id`)
 ) ENGINE = InnoDB AUTO_INCREMENT = 34 DEFAULT CHARSET = utf8mb3;
+-- Create or replace slackblast.paxminer_schema_mappings table
+DROP TABLE IF EXISTS slackblast.paxminer_schema_mappings;
+CREATE TABLE slackblast.`paxminer_schema_mappings` (
+  `team_id` varchar(100) NOT NULL,
+  `paxminer_schema` varchar(45) NOT NULL,
+  `created` datetime NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  `updated` datetime NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+  PRIMARY KEY (`team_id`)
+) ENGINE = InnoDB DEFAULT CHARSET = utf8mb3;
+-- Create or replace slackblast.paxminer_discovery_failures table
+DROP TABLE IF EXISTS slackblast.paxminer_discovery_failures;
+CREATE TABLE slackblast.`paxminer_discovery_failures` (
+  `paxminer_schema` varchar(45) NOT NULL,
+  `error` varchar(255) DEFAULT NULL,
+  `attempts` int NOT NULL DEFAULT 1,
+  `created` datetime NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  `updated` datetime NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+  PRIMARY KEY (`paxminer_schema`)
+) ENGINE = InnoDB DEFAULT CHARSET = utf8mb3;
 -- Create or replace f3devregion tables
 DROP TABLE IF EXISTS f3devregion.beatdowns;
 CREATE TABLE f3devregion.`beatdowns` (
@@ -61,7 +81,8 @@ CREATE TABLE f3devregion.`beatdowns` (
   `backblast` longtext,
   `fngs` varchar(45) DEFAULT NULL,
   `fng_count` int DEFAULT NULL,
-  PRIMARY KEY (`ao_id`, `bd_date`, `q_user_id`)
+  PRIMARY KEY (`ao_id`, `bd_date`, `q_user_id`),
+  KEY `ix_beatdowns_timestamp` (`timestamp`)
 ) ENGINE = InnoDB DEFAULT CHARSET = utf8mb3;
 DROP TABLE IF EXISTS f3devregion.bd_attendance;
 CREATE TABLE f3devregion.`bd_attendance` (
@@ -71,7 +92,9 @@ CREATE TABLE f3devregion.`bd_attendance` (
   `ao_id` varchar(45) NOT NULL,
   `date` varchar(45) NOT NULL,
   `q_user_id` varchar(45) NOT NULL,
-  PRIMARY KEY (`q_user_id`, `user_id`, `ao_id`, `date`)
+  PRIMARY KEY (`q_user_id`, `user_id`, `ao_id`, `date`),
+  KEY `ix_bd_attendance_q_user_id_ao_id_date` (`q_user_id`, `ao_id`, `date`),
+  KEY `ix_bd_attendance_timestamp` (`timestamp`)
 ) ENGINE = InnoDB DEFAULT CHARSET = utf8mb3;
 DROP TABLE IF EXISTS f3devregion.aos;
 CREATE TABLE f3devregion.`aos` (
@@ -0,0 +1,80 @@
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+from typing import Any, Callable, Iterator, List
+
+from sqlalchemy.engine import Row
+from sqlalchemy.sql import Executable
+
+from utilities import constants, tracing
+from utilities.database import DbManager, get_engine
+from utilities.database.orm import PaxminerRegion
+
+# Runs the same work across many PAXMiner region schemas concurrently. For queries, every region schema lives on the
+# same server, so instead of an engine (and connection pool) per schema, queries share the admin engine's pool and are
+# pointed at each schema with schema_translate_map, which qualifies the ORM's unqualified region tables (beatdowns,
+# bd_attendance, ...).
+
+
+@dataclass
+class SchemaResult:
+    schema: str
+    value: Any = None
+    error: Exception = None
+    elapsed: float = 0.0
+
+
+def get_region_schemas() -> List[str]:
+    """Returns every schema listed in paxminer.regions."""
+    regions = DbManager.find_values(PaxminerRegion, [PaxminerRegion.schema_name], filters=[True], schema="paxminer")
+    return sorted({region.schema_name for region in regions if region.schema_name})
+
+
+def run_in_schema(func: Callable[[str], Any], schema: str) -> SchemaResult:
+    start = time.perf_counter()
+    try:
+        return SchemaResult(schema=schema, value=func(schema), elapsed=time.perf_counter() - start)
+    except Exception as e:
+        return SchemaResult(schema=schema, error=e, elapsed=time.perf_counter() - start)
+
+
+def query(statement: Executable) -> Callable[[str], List[Row]]:
+    """Wraps a query written against the ORM models, without a schema, as a function that runs it in a given schema."""
+
+    def run(schema: str) -> List[Row]:
+        with get_engine().connect() as conn:
+            conn = conn.execution_options(schema_translate_map={None: schema})
+            return conn.execute(statement).all()
+
+    return run
+
+
+def fan_out(
+    func: Callable[[str], Any], schemas: List[str] = None, max_workers: int = constants.FANOUT_MAX_WORKERS
+) -> Iterator[SchemaResult]:
+    """Calls `func(schema)` for many region schemas concurrently, yielding each schema's result as soon as it
+    finishes. A failure in one schema (e.g. a region without Weaselbot tables) is reported on its result rather than
+    raised.
+
+    Usage:
+        statement = select(func.count()).select_from(Backblast).where(Backblast.bd_date >= date(2024, 1, 1))
+        for result in fan_out(query(statement)):
+            print(result.schema, result.value[0][0] if not result.error else result.error)
+
+    Args:
+        func (Callable[[str], Any]): work to do in one schema, e.g. query(statement)
+        schemas (List[str], optional): schemas to run in. Defaults to every PAXMiner region schema.
+        max_workers (int, optional): concurrent calls; kept within the connection pool size. Defaults to
+            FANOUT_MAX_WORKERS.
+
+    Yields:
+        SchemaResult: the return value (or the error) for one schema, in completion order
+    """
+    schemas = get_region_schemas() if schemas is None else schemas
+    if not schemas:
+        return
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(schemas))) as executor:
+        run = tracing.propagate(run_in_schema)
+        futures = [executor.submit(run, func, schema) for schema in schemas]
+        for future in as_completed(futures):
+            yield future.result()
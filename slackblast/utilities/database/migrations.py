@@ -0,0 +1,206 @@
+import argparse
+import logging
+import os
+import sys
+from datetime import date
+from typing import Dict, List
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", ".."))
+
+from sqlalchemy import inspect, select, text
+from sqlalchemy.dialects import mysql
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import ClauseElement, Executable
+
+from utilities.database import get_engine
+from utilities.database.fanout import fan_out
+from utilities.database.orm import (
+    AchievementsAwarded,
+    Attendance,
+    Backblast,
+    BaseClass,
+    PaxminerDiscoveryFailure,
+    PaxminerSchemaMapping,
+    Region,
+)
+from utilities.paxminer_schemas import discover_paxminer_schemas, import_legacy_mappings
+
+# Brings existing databases up to the ORM models; run it before deploying. It first creates missing slackblast tables
+# and adds missing columns, then seeds the team id -> PAXMiner schema mappings (from the old pickle file, then by
+# probing every unmapped region), then adds the indexes declared on the ORM models to existing per-region PAXMiner
+# schemas. Safe to run repeatedly: tables, columns, mappings and indexes that already exist, and tables a region
+# doesn't have (e.g. no Weaselbot), are skipped.
+#
+# Usage (from the slackblast directory):
+#     python utilities/database/migrations.py                 # slackblast tables and every PAXMiner region schema
+#     python utilities/database/migrations.py f3devregion     # specific schemas
+#     python utilities/database/migrations.py --explain f3devregion
+
+logger = logging.getLogger()
+
+PAXMINER_REGION_TABLES = [Backblast, Attendance, AchievementsAwarded]
+
+# Tables added to the slackblast schema after it was first created
+SLACKBLAST_TABLES = [PaxminerSchemaMapping, PaxminerDiscoveryFailure]
+
+# Columns added to slackblast tables after they were first created. They must be nullable so existing rows stay valid.
+SLACKBLAST_COLUMNS = [Region.__table__.c.email_attachment_limit]
+
+# The query shapes on the request path, for checking with EXPLAIN that each one is served by an index
+HOT_QUERIES = {
+    "duplicate check (beatdowns)": select(Backblast.timestamp).where(
+        Backblast.q_user_id == "U0", Backblast.ao_id == "C0", Backblast.bd_date == date(2024, 1, 1)
+    ),
+    "duplicate check (bd_attendance)": select(Attendance.timestamp).where(
+        Attendance.q_user_id == "U0", Attendance.ao_id == "C0", Attendance.date == date(2024, 1, 1)
+    ),
+    "backblast edit (beatdowns)": select(Backblast.ao_id).where(Backblast.timestamp == "0"),
+    "backblast edit (bd_attendance)": select(Attendance.user_id).where(Attendance.timestamp == "0"),
+    "weaselbot award counts": select(AchievementsAwarded.pax_id, AchievementsAwarded.achievement_id).where(
+        AchievementsAwarded.pax_id.in_(["U0"]),
+        AchievementsAwarded.date_awarded >= date(2024, 1, 1),
+        AchievementsAwarded.date_awarded <= date(2024, 12, 31),
+    ),
+}
+
+
+class Explain(Executable, ClauseElement):
+    """EXPLAIN of a select. Unlike EXPLAIN in a text() string, the select is compiled on execution, so the
+    connection's schema_translate_map points it at the region schema."""
+
+    inherit_cache = False
+
+    def __init__(self, statement):
+        self.statement = statement
+
+
+@compiles(Explain)
+def compile_explain(element, compiler, **kw):
+    return f"EXPLAIN {compiler.process(element.statement, **kw)}"
+
+
+def apply_tables() -> List[str]:
+    """Creates any table in SLACKBLAST_TABLES that is missing from the slackblast schema.
+
+    Returns:
+        List[str]: names of the tables that were created
+    """
+    with get_engine().begin() as conn:
+        inspector = inspect(conn)
+        missing = [cls.__table__ for cls in SLACKBLAST_TABLES if not inspector.has_table(cls.__tablename__)]
+        for table in missing:
+            logger.info(f"Creating {table.name}")
+        BaseClass.metadata.create_all(bind=conn, tables=missing)
+    return [table.name for table in missing]
+
+
+def seed_paxminer_schemas() -> Dict[str, str]:
+    """Fills the team id -> PAXMiner schema mapping table, so lookups on the request path don't miss and trigger
+    discovery. Imports the old pickle file, then probes every region that is still unmapped.
+
+    Returns:
+        Dict[str, str]: the mappings that were added, PAXMiner schema names keyed by Slack team id
+    """
+    mappings = import_legacy_mappings()
+    mappings.update(discover_paxminer_schemas(logger, max_regions=None))
+    return mappings
+
+
+def apply_columns() -> List[str]:
+    """Adds any column in SLACKBLAST_COLUMNS that is missing from the slackblast schema.
+
+    Returns:
+        List[str]: names of the columns that were added, as table.column
+    """
+    added = []
+    with get_engine().begin() as conn:
+        inspector = inspect(conn)
+        for column in SLACKBLAST_COLUMNS:
+            table = column.table
+            existing = {c["name"] for c in inspector.get_columns(table.name)}
+            if column.name not in existing:
+                column_type = column.type.compile(dialect=mysql.dialect())
+                logger.info(f"Adding {table.name}.{column.name} ({column_type})")
+                conn.execute(text(f"ALTER TABLE `{table.name}` ADD COLUMN `{column.name}` {column_type} NULL"))
+                added.append(f"{table.name}.{column.name}")
+    return added
+
+
+def apply_indexes(schema: str) -> List[str]:
+    """Creates any ORM-declared index that is missing from a region schema.
+
+    Args:
+        schema (str): PAXMiner region schema
+
+    Returns:
+        List[str]: names of the indexes that were created
+    """
+    created = []
+    # the schema is passed explicitly to the inspector, which doesn't apply schema_translate_map
+    with get_engine(schema=schema).begin() as conn:
+        inspector = inspect(conn)
+        for cls in PAXMINER_REGION_TABLES:
+            table = cls.__table__
+            if not inspector.has_table(table.name, schema=schema):
+                logger.info(f"{schema}.{table.name} does not exist, skipping")
+                continue
+            existing = {index["name"] for index in inspector.get_indexes(table.name, schema=schema)}
+            for index in table.indexes:
+                if index.name not in existing:
+                    logger.info(f"Creating {index.name} on {schema}.{table.name}")
+                    index.create(bind=conn)
+                    created.append(index.name)
+    return created
+
+
+def explain_hot_queries(schema: str) -> Dict[str, str]:
+    """Runs EXPLAIN on each hot query against a schema and logs a warning for any that isn't served by an index.
+
+    Args:
+        schema (str): PAXMiner region schema
+
+    Returns:
+        Dict[str, str]: the index MySQL chose for each query (None if it would scan the table)
+    """
+    chosen = {}
+    with get_engine(schema=schema).connect() as conn:
+        for name, query in HOT_QUERIES.items():
+            plan = conn.execute(Explain(query)).mappings().first()
+            chosen[name] = plan["key"]
+            if plan["key"]:
+                logger.info(f"{name}: {plan['key']} ({plan['type']})")
+            else:
+                logger.warning(f"{name}: no index used ({plan['type']}), query is a table scan")
+    return chosen
+
+
+def migrate_region(schema: str, explain: bool = False) -> List[str]:
+    created = apply_indexes(schema)
+    if explain:
+        explain_hot_queries(schema)
+    return created
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Apply ORM-declared columns and indexes to existing schemas")
+    parser.add_argument("schemas", nargs="*", help="schemas to migrate (defaults to every PAXMiner region)")
+    parser.add_argument("--explain", action="store_true", help="also EXPLAIN the hot queries against each schema")
+    args = parser.parse_args()
+
+    logger.setLevel(logging.INFO)
+    logger.addHandler(logging.StreamHandler())
+
+    created = apply_tables()
+    added = apply_columns()
+    logger.info(f"slackblast: {len(created)} tables created, {len(added)} columns added")
+    logger.info(f"slackblast: {len(seed_paxminer_schemas())} PAXMiner schema mappings added")
+
+    for result in fan_out(lambda schema: migrate_region(schema, args.explain), args.schemas or None):
+        if result.error:
+            logger.error(f"{result.schema}: migration failed: {result.error}")
+        else:
+            logger.info(f"{result.schema}: {len(result.value)} indexes created")
+
+
+if __name__ == "__main__":
+    main()
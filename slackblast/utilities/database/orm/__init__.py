@@ -1,7 +1,7 @@
 from datetime import date, datetime
 from typing import Any, Optional
 
-from sqlalchemy import Column, DateTime, ForeignKey, Integer, String, Table
+from sqlalchemy import Column, DateTime, ForeignKey, Index, Integer, String, Table
 from sqlalchemy.dialects.mysql import DATE, JSON, LONGTEXT, TEXT, TINYINT
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, registry
 from typing_extensions import Annotated
@@ -51,6 +51,11 @@ class GetDBClass:
     def to_json(self):
         return {c.key: self.get(c.key) for c in self.__table__.columns}
 
+    def set_fields(self):
+        """Columns that were given a value on this instance, so writes leave the rest of the row (and columns a
+        region's schema may not have) alone."""
+        return {c.key: getattr(self, c.key) for c in self.__table__.columns if c.key in self.__dict__}
+
     def __repr__(self):
         return str(self.to_json())
 
@@ -69,6 +74,7 @@ class Region(BaseClass, GetDBClass):
     email_password: Mapped[Optional[longtext]]
     email_to: Mapped[Optional[str100]]
     email_option_show: Mapped[Optional[tinyint0]]
+    email_attachment_limit: Mapped[Optional[int]]
     postie_format: Mapped[Optional[tinyint1]]
     editing_locked: Mapped[tinyint0]
     default_destination: Mapped[Optional[str]] = mapped_column(String(30), default="ao_channel")
@@ -96,8 +102,33 @@ class Region(BaseClass, GetDBClass):
         return Region.team_id
 
 
+class PaxminerSchemaMapping(BaseClass, GetDBClass):
+    __tablename__ = "paxminer_schema_mappings"
+    team_id: Mapped[str] = mapped_column(String(100), primary_key=True)
+    paxminer_schema: Mapped[str45]
+    created: Mapped[dt_create]
+    updated: Mapped[dt_update]
+
+    def get_id():
+        return PaxminerSchemaMapping.team_id
+
+
+class PaxminerDiscoveryFailure(BaseClass, GetDBClass):
+    __tablename__ = "paxminer_discovery_failures"
+    paxminer_schema: Mapped[str45pk]
+    error: Mapped[Optional[str255]]
+    attempts: Mapped[int] = mapped_column(Integer, default=1)
+    created: Mapped[dt_create]
+    updated: Mapped[dt_update]
+
+    def get_id():
+        return PaxminerDiscoveryFailure.paxminer_schema
+
+
 class Backblast(BaseClass, GetDBClass):
     __tablename__ = "beatdowns"
+    # the primary key already covers lookups by (q_user_id, ao_id, bd_date)
+    __table_args__ = (Index("ix_beatdowns_timestamp", "timestamp"),)
     timestamp: Mapped[Optional[str45]]
     ts_edited: Mapped[Optional[str45]]
     ao_id: Mapped[str45pk]
@@ -117,6 +148,10 @@ class Backblast(BaseClass, GetDBClass):
 
 class Attendance(BaseClass, GetDBClass):
     __tablename__ = "bd_attendance"
+    __table_args__ = (
+        Index("ix_bd_attendance_q_user_id_ao_id_date", "q_user_id", "ao_id", "date"),
+        Index("ix_bd_attendance_timestamp", "timestamp"),
+    )
     timestamp: Mapped[Optional[str45]]
     ts_edited: Mapped[Optional[str45]]
     user_id: Mapped[str45pk]
@@ -187,6 +222,7 @@ class AchievementsList(BaseClass, GetDBClass):
 
 class AchievementsAwarded(BaseClass, GetDBClass):
     __tablename__ = "achievements_awarded"
+    __table_args__ = (Index("ix_achievements_awarded_pax_id_date_awarded", "pax_id", "date_awarded"),)
     id: Mapped[intpk]
     achievement_id: Mapped[int] = mapped_column(Integer, ForeignKey("achievements_list.id"))
     pax_id: Mapped[str255]
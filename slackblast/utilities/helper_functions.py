@@ -1,21 +1,23 @@
 import os
-import pickle
 import re
 from datetime import datetime
 from logging import Logger
-from typing import Any, Dict, List, Tuple
+from typing import Any, Dict, Tuple
 
 from slack_bolt.adapter.aws_lambda.lambda_s3_oauth_flow import LambdaS3OAuthFlow
 from slack_bolt.oauth.oauth_settings import OAuthSettings
 from slack_sdk.web import WebClient
+from sqlalchemy import or_
+from sqlalchemy.engine import Row
 
 from utilities import constants
 from utilities.constants import LOCAL_DEVELOPMENT
 from utilities.database import DbManager
-from utilities.database.orm import Attendance, Backblast, PaxminerAO, PaxminerRegion, PaxminerUser, Region
-from utilities.slack import actions
-
-REGION_RECORDS: Dict[str, Region] = {}
+from utilities.database.orm import Attendance, Backblast, Region
+from utilities.paxminer_directory import get_paxminer_directory, normalize_user_handle
+from utilities.paxminer_schemas import get_paxminer_schema
+from utilities.region_cache import cache_region_record, get_cached_region_record, load_region_records
+from utilities.slack.directory import get_slack_channel_id, get_slack_channels, get_slack_users
 
 
 def get_oauth_flow():
@@ -53,15 +55,13 @@ def safe_get(data, *keys):
 def get_channel_name(id, logger, client, region_record: Region = None):
     ao_record = None
     if region_record.paxminer_schema:
-        ao_record = DbManager.get_record(PaxminerAO, id, region_record.paxminer_schema)
+        ao_record = get_paxminer_directory(region_record.paxminer_schema).aos.get(id)
 
     if not ao_record:
-        try:
-            channel_info_dict = client.conversations_info(channel=id)
-        except Exception as e:
-            logger.error(e)
+        channel = get_slack_channels([id], client, logger).get(id)
+        if not channel:
             return ""
-        channel_name = safe_get(channel_info_dict, "channel", "name") or None
+        channel_name = safe_get(channel, "name") or None
         logger.debug("channel_name is {}".format(channel_name))
         return channel_name
     else:
@@ -72,40 +72,29 @@ def get_channel_names(
     array_of_channel_ids,
     logger: Logger,
     client: WebClient,
-    channel_records: List[PaxminerAO] = None,
+    channel_records: Dict[str, Row] = None,
 ):
     names = []
+    channel_records = channel_records or {}
 
-    if channel_records:
-        for channel_id in array_of_channel_ids:
-            channel = [u for u in channel_records if u.channel_id == channel_id]
-            if channel:
-                channel_name = channel[0].ao
-            else:
-                channel_info_dict = client.conversations_info(channel=channel_id)
-                channel_name = safe_get(channel_info_dict, "channel", "name") or None
-            if channel_name:
-                names.append(channel_name)
+    missing_ids = [channel_id for channel_id in array_of_channel_ids if channel_id not in channel_records]
+    slack_channels = get_slack_channels(missing_ids, client, logger)
 
-    else:
-        for channel_id in array_of_channel_ids:
-            channel_info_dict = client.conversations_info(channel=channel_id)
-            channel_name = safe_get(channel_info_dict, "channel", "name") or None
-            if channel_name:
-                names.append(channel_name)
-            logger.debug("user_name is {}".format(channel_name))
-        logger.debug("names are {}".format(names))
+    for channel_id in array_of_channel_ids:
+        channel = channel_records.get(channel_id)
+        if channel:
+            channel_name = channel.ao
+        else:
+            channel_name = safe_get(slack_channels, channel_id, "name") or None
+        if channel_name:
+            names.append(channel_name)
+    logger.debug("names are {}".format(names))
 
     return names
 
 
 def get_channel_id(name, logger, client):
-    channel_info_dict = client.conversations_list()
-    channels = channel_info_dict["channels"]
-    for channel in channels:
-        if channel["name"] == name:
-            return channel["id"]
-    return None
+    return get_slack_channel_id(name, client, logger)
 
 
 def get_user_names(
@@ -113,41 +102,31 @@ def get_user_names(
     logger,
     client: WebClient,
     return_urls=False,
-    user_records: List[PaxminerUser] = None,
+    user_records: Dict[str, Row] = None,
 ):
     names = []
     urls = []
+    if return_urls or not user_records:
+        user_records = {}
 
-    if user_records and not return_urls:
-        for user_id in array_of_user_ids:
-            user = [u for u in user_records if u.user_id == user_id]
-            if user:
-                user_name = user[0].user_name or user[0].real_name
-            else:
-                user_info_dict = client.users_info(user=user_id)
-                user_name = (
-                    safe_get(user_info_dict, "user", "profile", "display_name")
-                    or safe_get(user_info_dict, "user", "profile", "real_name")
-                    or None
-                )
-            if user_name:
-                names.append(user_name)
+    missing_ids = [user_id for user_id in array_of_user_ids if user_id not in user_records]
+    slack_users = get_slack_users(missing_ids, client, logger)
 
-    else:
-        for user_id in array_of_user_ids:
-            user_info_dict = client.users_info(user=user_id)
+    for user_id in array_of_user_ids:
+        user = user_records.get(user_id)
+        if user:
+            user_name = user.user_name or user.real_name
+        else:
             user_name = (
-                safe_get(user_info_dict, "user", "profile", "display_name")
-                or safe_get(user_info_dict, "user", "profile", "real_name")
+                safe_get(slack_users, user_id, "profile", "display_name")
+                or safe_get(slack_users, user_id, "profile", "real_name")
                 or None
             )
-            if user_name:
-                names.append(user_name)
-            logger.debug("user_name is {}".format(user_name))
-
-            user_icon_url = user_info_dict["user"]["profile"]["image_192"]
-            urls.append(user_icon_url)
-        logger.debug("names are {}".format(names))
+        if user_name:
+            names.append(user_name)
+        if return_urls:
+            urls.append(safe_get(slack_users, user_id, "profile", "image_192"))
+    logger.debug("names are {}".format(names))
 
     if return_urls:
         return names, urls
@@ -155,24 +134,15 @@ def get_user_names(
         return names
 
 
-def get_user_ids(user_names, client, user_records: List[PaxminerUser]):
-    if user_records:
-        member_list = {}
-        for user in user_records:
-            user_name_search = user.user_name.lower()
-            user_name_search = re.sub(r"\s\(([\s\S]*?\))", "", user_name_search).replace(" ", "_")
-            member_list[user_name_search] = user.user_id
+def get_user_ids(user_names, client, user_handles: Dict[str, str] = None):
+    if user_handles:
+        member_list = user_handles
     else:
         members = client.users_list()["members"]
         member_list = {}
         for member in members:
-            member_dict = member["profile"]
-            member_dict.update({"id": member["id"]})
-            if member_dict["display_name"] == "":
-                member_dict["display_name"] = member_dict["real_name"]
-            member_dict["display_name"] = member_dict["display_name"].lower()
-            member_dict["display_name"] = re.sub(r"\s\(([\s\S]*?\))", "", member_dict["display_name"]).replace(" ", "_")
-            member_list[member_dict["display_name"]] = member_dict["id"]
+            display_name = member["profile"]["display_name"] or member["profile"]["real_name"]
+            member_list[normalize_user_handle(display_name)] = member["id"]
 
     user_ids = []
     for user_name in user_names:
@@ -188,9 +158,9 @@ def get_user_ids(user_names, client, user_records: List[PaxminerUser]):
     return user_ids
 
 
-def parse_moleskin_users(msg, client, user_records: List[PaxminerUser]):
+def parse_moleskin_users(msg, client, user_handles: Dict[str, str] = None):
     pattern = "@([A-Za-z0-9-_']+)"
-    user_ids = get_user_ids(re.findall(pattern, msg), client, user_records)
+    user_ids = get_user_ids(re.findall(pattern, msg), client, user_handles)
 
     msg2 = re.sub(pattern, "{}", msg).format(*user_ids)
     return msg2
@@ -214,78 +184,23 @@ def check_for_duplicate(
     """Check if there is already a backblast for this AO and Q on this date"""
     logger.debug(f"Checking for duplicate backblast for {q} at {ao} on {date}")
     if region_record.paxminer_schema:
-        backblast_dups = DbManager.find_records(
-            cls=Backblast,
-            filters=[Backblast.q_user_id == q, Backblast.ao_id == ao, Backblast.bd_date == date],
-            schema=region_record.paxminer_schema,
-        )
-        attendance_dups = DbManager.find_records(
-            cls=Attendance,
-            filters=[Attendance.q_user_id == q, Attendance.ao_id == ao, Attendance.date == date],
+        backblast_filters = [Backblast.q_user_id == q, Backblast.ao_id == ao, Backblast.bd_date == date]
+        attendance_filters = [Attendance.q_user_id == q, Attendance.ao_id == ao, Attendance.date == date]
+        if og_ts:
+            # rows belonging to the backblast being edited don't count
+            backblast_filters.append(or_(Backblast.timestamp.is_(None), Backblast.timestamp != og_ts))
+            attendance_filters.append(or_(Attendance.timestamp.is_(None), Attendance.timestamp != og_ts))
+        logger.debug(f"og_ts: {og_ts}")
+        is_duplicate = DbManager.exists(
+            [(Backblast, backblast_filters), (Attendance, attendance_filters)],
             schema=region_record.paxminer_schema,
         )
-        logger.debug(f"Backblast dups: {backblast_dups}")
-        logger.debug(f"og_ts: {og_ts}")
-        is_duplicate = (len(backblast_dups) > 0 or len(attendance_dups) > 0) and og_ts != backblast_dups[0].timestamp
     else:
         is_duplicate = False
 
     return is_duplicate
 
 
-def get_paxminer_schema(team_id: str, logger) -> str:
-    """Scrapes the paxminer db to figure out this team's paxminer schema
-
-    Args:
-        team_id (str): slack internal team id
-
-    Returns:
-        str: returns the paxminer schema name
-    """ """"""
-
-    with open("data/paxminer_dict.pickle", "rb") as f:
-        paxminer_dict = pickle.load(f)
-
-    paxminer_schema = safe_get(paxminer_dict, team_id)
-    slack_response = None
-    if paxminer_schema:
-        logger.debug(f"PAXMiner schema for {team_id} is {paxminer_schema}")
-        return paxminer_schema
-
-    else:
-        paxminer_region_records = DbManager.find_records(PaxminerRegion, filters=[True], schema="paxminer")
-
-        for region in paxminer_region_records:
-            slack_client = WebClient(region.slack_token)
-
-            ao_index = 0
-            try:
-                ao_records: List[PaxminerAO] = DbManager.find_records(
-                    PaxminerAO, filters=[True], schema=region.schema_name
-                )
-                ao_records = [ao for ao in ao_records if ao.channel_id is not None]
-
-                keep_trying = True
-                while keep_trying and ao_index < len(ao_records):
-                    try:
-                        slack_response = slack_client.conversations_info(channel=ao_records[ao_index].channel_id)
-                        keep_trying = False
-                    except Exception:
-                        ao_index += 1
-
-            except Exception:
-                logger.debug("No AOs table, skipping...")
-                continue
-
-            pm_team_id = safe_get(slack_response, "channel", "shared_team_ids", 0)
-            if team_id == pm_team_id:
-                logger.debug(f"PAXMiner schema for {team_id} is {region.schema_name}")
-                return region.schema_name
-
-        logger.debug(f"No PAXMiner schema found for {team_id}")
-        return None
-
-
 def replace_slack_user_ids(text: str, client, logger, region_record: Region = None) -> str:
     """Replace slack user ids with their user names
 
@@ -297,7 +212,7 @@ def replace_slack_user_ids(text: str, client, logger, region_record: Region = No
     """
     user_records = None
     if region_record.paxminer_schema:
-        user_records = DbManager.find_records(PaxminerUser, filters=[True], schema=region_record.paxminer_schema)
+        user_records = get_paxminer_directory(region_record.paxminer_schema).users
 
     slack_user_ids = re.findall(r"<@([A-Z0-9]+)>", text or "")
     slack_user_names = get_user_names(slack_user_ids, logger, client, return_urls=False, user_records=user_records)
@@ -311,10 +226,7 @@ def replace_slack_user_ids(text: str, client, logger, region_record: Region = No
 
 
 def get_region_record(team_id: str, body, context, client, logger) -> Region:
-    if not REGION_RECORDS:
-        update_local_region_records()
-
-    region_record = safe_get(REGION_RECORDS, team_id)
+    region_record = get_cached_region_record(team_id)
     team_domain = safe_get(body, "team", "domain")
 
     if not region_record:
@@ -335,7 +247,7 @@ def get_region_record(team_id: str, body, context, client, logger) -> Region:
                 editing_locked=0,
             )
         )
-        REGION_RECORDS[team_id] = region_record
+        cache_region_record(region_record)
 
     return region_record
 
@@ -345,11 +257,7 @@ def get_request_type(body: dict) -> Tuple[str]:
     if request_type == "event_callback":
         return ("event_callback", safe_get(body, "event", "type"))
     elif request_type == "block_actions":
-        block_action = safe_get(body, "actions", 0, "action_id")
-        if block_action[: len(actions.STRAVA_ACTIVITY_BUTTON)] == actions.STRAVA_ACTIVITY_BUTTON:
-            return ("block_actions", actions.STRAVA_ACTIVITY_BUTTON)
-        else:
-            return ("block_actions", block_action)
+        return ("block_actions", safe_get(body, "actions", 0, "action_id"))
     elif request_type == "view_submission":
         return ("view_submission", safe_get(body, "view", "callback_id"))
     elif not request_type and "command" in body:
@@ -362,9 +270,7 @@ def get_request_type(body: dict) -> Tuple[str]:
 
 def update_local_region_records() -> None:
     print("Updating local region records...")
-    region_records: List[Region] = DbManager.find_records(Region, filters=[True])
-    global REGION_RECORDS
-    REGION_RECORDS = {region.team_id: region for region in region_records}
+    load_region_records()
 
 
 def parse_rich_block(
@@ -450,8 +356,9 @@ def replace_user_channel_ids(
         USER_PATTERN = r"<@([A-Z0-9]+)>"
         CHANNEL_PATTERN = r"<#([A-Z0-9]+)(?:\|[A-Za-z\d]+)?>"
         if region_record.paxminer_schema:
-            user_records = DbManager.find_records(PaxminerUser, filters=[True], schema=region_record.paxminer_schema)
-            channel_records = DbManager.find_records(PaxminerAO, filters=[True], schema=region_record.paxminer_schema)
+            directory = get_paxminer_directory(region_record.paxminer_schema)
+            user_records = directory.users
+            channel_records = directory.aos
         updated_text = text.replace("{}", "")
 
         slack_user_ids = re.findall(USER_PATTERN, updated_text or "")
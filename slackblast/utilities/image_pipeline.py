@@ -0,0 +1,237 @@
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from logging import Logger
+from threading import Lock
+from typing import Any, BinaryIO, Dict, List, Optional
+
+import boto3
+import requests
+from boto3.s3.transfer import TransferConfig
+from botocore.exceptions import ClientError
+
+from utilities import constants, tracing
+
+S3_BUCKET = "slackblast-images"
+S3_URL_TEMPLATE = "https://slackblast-images.s3.amazonaws.com/{key}"
+THUMB_SIZES = [64, 80, 160, 480, 720, 800, 960, 1024]
+
+S3_CLIENT = None
+S3_CLIENT_LOCK = Lock()
+# S3 keys known to be uploaded already; keys are derived from the immutable Slack file id, so a key that exists
+# always holds the same content
+UPLOADED_KEYS = set()
+UPLOADED_KEYS_LOCK = Lock()
+HTTP_SESSION = requests.Session()
+S3_TRANSFER_CONFIG = TransferConfig(
+    multipart_threshold=constants.IMAGE_UPLOAD_CHUNK_SIZE,
+    multipart_chunksize=constants.IMAGE_UPLOAD_CHUNK_SIZE,
+    max_concurrency=constants.IMAGE_UPLOAD_MAX_CONCURRENCY,
+)
+# boto3's TransferConfig doesn't take this as an argument, but s3transfer reads it when buffering non-seekable streams
+S3_TRANSFER_CONFIG.max_in_memory_upload_chunks = constants.IMAGE_UPLOAD_MAX_IN_MEMORY_CHUNKS
+
+
+@dataclass
+class ProcessedFile:
+    file_url: str
+    low_res_file_url: str
+    attachment: Optional[Dict[str, Any]]
+    timings: Dict[str, float] = field(default_factory=dict)
+
+
+def get_s3_client():
+    global S3_CLIENT
+    with S3_CLIENT_LOCK:
+        if not S3_CLIENT:
+            if constants.LOCAL_DEVELOPMENT:
+                S3_CLIENT = boto3.client(
+                    "s3",
+                    aws_access_key_id=os.environ[constants.AWS_ACCESS_KEY_ID],
+                    aws_secret_access_key=os.environ[constants.AWS_SECRET_ACCESS_KEY],
+                )
+            else:
+                S3_CLIENT = boto3.client("s3")
+    return S3_CLIENT
+
+
+def is_uploaded(key: str) -> bool:
+    """Checks the local manifest, then S3 itself, for an object that was already uploaded under this key."""
+    with UPLOADED_KEYS_LOCK:
+        if key in UPLOADED_KEYS:
+            return True
+    try:
+        with tracing.span("s3.head_object", key=key):
+            get_s3_client().head_object(Bucket=S3_BUCKET, Key=key)
+    except ClientError:
+        return False
+    mark_uploaded(key)
+    return True
+
+
+def mark_uploaded(key: str):
+    with UPLOADED_KEYS_LOCK:
+        UPLOADED_KEYS.add(key)
+
+
+class TeeReader:
+    """File-like wrapper that copies everything read from `stream` into `copy_to`, so a download can be uploaded and
+    saved to disk in a single pass."""
+
+    def __init__(self, stream: BinaryIO, copy_to: BinaryIO):
+        self.stream = stream
+        self.copy_to = copy_to
+
+    def read(self, size: int = -1) -> bytes:
+        chunk = self.stream.read(size)
+        self.copy_to.write(chunk)
+        return chunk
+
+
+def stream_to_s3(
+    url: str, key: str, content_type: str, headers: Dict[str, str], params: Dict[str, Any] = None, file_path=None
+):
+    """Streams a download straight into a (multipart) S3 upload, holding at most a few chunks in memory.
+
+    Args:
+        url (str): url to download
+        key (str): S3 object key
+        content_type (str): content type to store on the S3 object
+        headers (Dict[str, str]): request headers, e.g. Slack auth
+        params (Dict[str, Any], optional): request query params
+        file_path (str, optional): if given, the download is also written to this path as it streams
+    """
+    with tracing.span("s3.upload", key=key), HTTP_SESSION.get(url, headers=headers, params=params, stream=True) as r:
+        r.raise_for_status()
+        r.raw.decode_content = True
+        extra_args = {"ContentType": content_type}
+        if file_path:
+            with open(file_path, "wb") as f:
+                get_s3_client().upload_fileobj(
+                    TeeReader(r.raw, f), S3_BUCKET, key, ExtraArgs=extra_args, Config=S3_TRANSFER_CONFIG
+                )
+        else:
+            get_s3_client().upload_fileobj(r.raw, S3_BUCKET, key, ExtraArgs=extra_args, Config=S3_TRANSFER_CONFIG)
+    mark_uploaded(key)
+
+
+def stream_to_file(url: str, file_path: str, headers: Dict[str, str], params: Dict[str, Any] = None):
+    with tracing.span("slack.download"), HTTP_SESSION.get(url, headers=headers, params=params, stream=True) as r:
+        r.raise_for_status()
+        with open(file_path, "wb") as f:
+            for chunk in r.iter_content(chunk_size=constants.IMAGE_DOWNLOAD_CHUNK_SIZE):
+                f.write(chunk)
+
+
+def process_file(file: Dict[str, Any], token: str, logger: Logger, keep_local_copy: bool = False) -> ProcessedFile:
+    """Streams a Slack file and a low res thumbnail of it into S3. Either upload is skipped if that object is already
+    in the bucket, e.g. when a backblast is edited with the same photos attached.
+
+    Args:
+        file (Dict[str, Any]): Slack file object, as returned in a file input's selected values
+        token (str): Slack bot token used to download the file
+        logger (Logger): logger
+        keep_local_copy (bool, optional): if True, the full res file and thumbnail are also saved to /tmp for use as
+            email attachments. Defaults to False.
+
+    Returns:
+        ProcessedFile: public S3 urls for the file and its thumbnail, the email attachment info (only when
+            keep_local_copy is set), and step timings
+    """
+    timings = {}
+    headers = {"Authorization": f"Bearer {token}"}
+
+    file_name = f"{file['id']}.{file['filetype']}"
+    file_path = f"/tmp/{file_name}" if keep_local_copy else None
+    file_mimetype = file["mimetype"]
+
+    start = time.perf_counter()
+    if not is_uploaded(file_name):
+        stream_to_s3(file["url_private_download"], file_name, file_mimetype, headers, file_path=file_path)
+    elif file_path:
+        stream_to_file(file["url_private_download"], file_path, headers)
+    timings["full_res"] = time.perf_counter() - start
+
+    # Determine the highest thumbnail size possible
+    highest_thumb = max(file["original_w"], file["original_h"])
+    thumb_size = next(
+        (size for size in THUMB_SIZES if size >= highest_thumb), 1024
+    )  # default to 1024 if no larger size found
+    file_name_low_res = f"{file['id']}_low_res.png"
+    file_path_low_res = f"/tmp/{file_name_low_res}" if keep_local_copy else None
+    low_res_url = file[f"thumb_{thumb_size}"]
+    low_res_params = {"width": constants.LOW_REZ_IMAGE_SIZE, "height": constants.LOW_REZ_IMAGE_SIZE}
+
+    start = time.perf_counter()
+    if not is_uploaded(file_name_low_res):
+        stream_to_s3(low_res_url, file_name_low_res, "image/png", headers, low_res_params, file_path_low_res)
+    elif file_path_low_res:
+        stream_to_file(low_res_url, file_path_low_res, headers, low_res_params)
+    timings["low_res"] = time.perf_counter() - start
+
+    attachment = None
+    if keep_local_copy:
+        attachment = {
+            "filepath": file_path,
+            "meta": {
+                "filename": file_name,
+                "maintype": file_mimetype.split("/")[0],
+                "subtype": file_mimetype.split("/")[1],
+            },
+            "url": S3_URL_TEMPLATE.format(key=file_name),
+            "low_res_filepath": file_path_low_res,
+            "low_res_meta": {"filename": file_name_low_res, "maintype": "image", "subtype": "png"},
+        }
+
+    return ProcessedFile(
+        file_url=S3_URL_TEMPLATE.format(key=file_name),
+        low_res_file_url=S3_URL_TEMPLATE.format(key=file_name_low_res),
+        attachment=attachment,
+        timings=timings,
+    )
+
+
+def process_files(
+    files: List[Dict[str, Any]], token: str, logger: Logger, keep_local_copy: bool = False
+) -> List[ProcessedFile]:
+    """Runs process_file for each file on a bounded thread pool. Results keep the order of `files`; files that fail
+    are logged and left out.
+
+    Args:
+        files (List[Dict[str, Any]]): Slack file objects
+        token (str): Slack bot token used to download the files
+        logger (Logger): logger
+        keep_local_copy (bool, optional): passed through to process_file. Defaults to False.
+
+    Returns:
+        List[ProcessedFile]: the successfully processed files, in input order
+    """
+
+    def safe_process(file):
+        try:
+            processed = process_file(file, token, logger, keep_local_copy=keep_local_copy)
+            print(json.dumps({"event_type": "image_processed", "file_id": file["id"], **processed.timings}))
+            return processed
+        except Exception as e:
+            logger.error(f"Error uploading file: {e}")
+            return None
+
+    if not files:
+        return []
+
+    with ThreadPoolExecutor(max_workers=min(constants.IMAGE_PIPELINE_MAX_WORKERS, len(files))) as executor:
+        results = list(executor.map(tracing.propagate(safe_process), files))
+    return [result for result in results if result]
+
+
+def remove_local_copies(attachments: List[Dict[str, Any]], logger: Logger):
+    for attachment in attachments:
+        for path in [attachment["filepath"], attachment.get("low_res_filepath")]:
+            if not path:
+                continue
+            try:
+                os.remove(path)
+            except Exception as e:
+                logger.error(f"Error removing file: {e}")
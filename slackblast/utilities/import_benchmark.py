@@ -0,0 +1,95 @@
+"""Reports cold import times for the app and each module it can load, to keep an eye on Lambda cold starts.
+
+Each module is imported in a fresh interpreter with `python -X importtime`, so every number is a true cold import
+(including everything the module pulls in transitively).
+
+Usage (from the slackblast directory):
+    python utilities/import_benchmark.py
+    python utilities/import_benchmark.py --top 15 features.backblast
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+from typing import Dict, List, Tuple
+
+SLACKBLAST_DIR = os.path.join(os.path.dirname(__file__), "..")
+
+DEFAULT_MODULES = [
+    "app",
+    "utilities.routing",
+    "utilities.helper_functions",
+    "utilities.database",
+    "features.backblast",
+    "features.preblast",
+    "features.config",
+    "features.strava",
+    "features.weaselbot",
+    "features.welcome",
+    "features.custom_fields",
+    "utilities.announcements",
+]
+
+
+def import_times(module: str) -> Tuple[float, List[Tuple[str, float, float]]]:
+    """Imports a module in a fresh interpreter and parses the -X importtime report.
+
+    Args:
+        module (str): dotted module path
+
+    Returns:
+        Tuple[float, List[Tuple[str, float, float]]]: the module's cumulative import time in ms, and (module, self ms,
+            cumulative ms) for everything that was imported along the way
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=SLACKBLAST_DIR,
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr.splitlines()[-1]}")
+
+    # children are reported before their parent, and top level imports have no indent; keep only the entries from the
+    # target module's subtree, which drops interpreter startup imports (site, encodings, ...)
+    imported = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:") :].split("|")
+        if name[1:2] != " ":
+            if name.strip() == module:
+                imported.append((module, int(self_us) / 1000, int(cumulative_us) / 1000))
+                return imported[-1][2], imported
+            imported = []
+            continue
+        imported.append((name.strip(), int(self_us) / 1000, int(cumulative_us) / 1000))
+    return 0.0, []
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("modules", nargs="*", default=DEFAULT_MODULES)
+    parser.add_argument("--top", type=int, default=10, help="heaviest transitive imports to list per module")
+    args = parser.parse_args()
+
+    totals: Dict[str, float] = {}
+    for module in args.modules:
+        try:
+            total, imported = import_times(module)
+        except RuntimeError as e:
+            print(e)
+            continue
+        totals[module] = total
+        print(f"\n{module}: {total:.1f} ms")
+        for name, self_ms, cumulative_ms in sorted(imported[:-1], key=lambda x: x[2], reverse=True)[: args.top]:
+            print(f"    {cumulative_ms:9.1f} ms cumulative {self_ms:9.1f} ms self  {name}")
+
+    print("\nSummary (cold import, ms):")
+    for module, total in sorted(totals.items(), key=lambda x: x[1], reverse=True):
+        print(f"    {total:9.1f}  {module}")
+
+
+if __name__ == "__main__":
+    main()
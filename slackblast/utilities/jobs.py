@@ -0,0 +1,161 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import traceback
+from dataclasses import dataclass, field
+from datetime import datetime
+from logging import Logger
+from typing import Any, Callable, Dict, List
+from uuid import uuid4
+
+from utilities import constants, tracing
+
+# Side effects that don't need to finish before the user sees their post (db inserts, emails, cleanup) are enqueued
+# here by handlers and run by app.main_response once the handler has returned. Jobs are kept per thread, so
+# concurrent requests in one process never run each other's jobs.
+
+PENDING = "pending"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+
+@dataclass
+class Job:
+    name: str
+    func: Callable
+    kwargs: Dict[str, Any]
+    max_attempts: int = constants.JOB_MAX_ATTEMPTS
+    on_failure: Callable[[Exception], None] = None
+    id: str = field(default_factory=lambda: uuid4().hex)
+    status: str = PENDING
+    attempts: int = 0
+    error: str = None
+
+
+class InProcessJobQueue:
+    """Keeps pending jobs in memory for the current thread."""
+
+    def __init__(self):
+        self._local = threading.local()
+
+    @property
+    def pending(self) -> List[Job]:
+        if not hasattr(self._local, "pending"):
+            self._local.pending = []
+        return self._local.pending
+
+    def add(self, job: Job):
+        self.pending.append(job)
+
+    def record(self, job: Job):
+        pass
+
+    def take_pending(self) -> List[Job]:
+        jobs, self._local.pending = self.pending, []
+        return jobs
+
+
+class SqliteJobQueue(InProcessJobQueue):
+    """Local development stand-in for a durable queue: jobs still run in process, but every job and its status,
+    attempts, and last error are recorded in a SQLite file so they can be inspected after the fact."""
+
+    def __init__(self, path: str):
+        super().__init__()
+        self.path = path
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs (id TEXT PRIMARY KEY, name TEXT, kwargs TEXT, status TEXT, "
+                "attempts INTEGER, error TEXT, created TEXT, updated TEXT)"
+            )
+
+    def _connect(self):
+        return sqlite3.connect(self.path)
+
+    def add(self, job: Job):
+        super().add(job)
+        now = datetime.utcnow().isoformat()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO jobs VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (job.id, job.name, json.dumps(job.kwargs, default=str), job.status, job.attempts, job.error, now, now),
+            )
+
+    def record(self, job: Job):
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = ?, attempts = ?, error = ?, updated = ? WHERE id = ?",
+                (job.status, job.attempts, job.error, datetime.utcnow().isoformat(), job.id),
+            )
+
+
+def get_job_queue() -> InProcessJobQueue:
+    if os.environ.get(constants.JOB_QUEUE_BACKEND) == "sqlite":
+        return SqliteJobQueue(os.environ.get(constants.JOB_QUEUE_SQLITE_PATH, "slackblast_jobs.sqlite"))
+    return InProcessJobQueue()
+
+
+JOB_QUEUE = get_job_queue()
+
+
+def enqueue(name: str, func: Callable, max_attempts: int = None, on_failure: Callable = None, **kwargs) -> Job:
+    """Schedules `func(**kwargs)` to run after the current handler returns.
+
+    Args:
+        name (str): job name, used in logs and job status records
+        func (Callable): function to run
+        max_attempts (int, optional): how many times to try before giving up. Defaults to JOB_MAX_ATTEMPTS.
+        on_failure (Callable, optional): called with the last exception if every attempt fails
+
+    Returns:
+        Job: the scheduled job
+    """
+    job = Job(
+        name=name,
+        func=func,
+        kwargs=kwargs,
+        max_attempts=max_attempts or constants.JOB_MAX_ATTEMPTS,
+        on_failure=on_failure,
+    )
+    JOB_QUEUE.add(job)
+    return job
+
+
+def run_job(job: Job, logger: Logger):
+    job.status = RUNNING
+    last_exc = None
+    while job.attempts < job.max_attempts:
+        job.attempts += 1
+        try:
+            with tracing.span("job", job=job.name, attempt=job.attempts):
+                job.func(**job.kwargs)
+            job.status = SUCCEEDED
+            job.error = None
+            JOB_QUEUE.record(job)
+            return
+        except Exception as exc:
+            last_exc = exc
+            job.error = "".join(traceback.format_exception(None, exc, exc.__traceback__))
+            logger.error(f"Job {job.name} failed on attempt {job.attempts}/{job.max_attempts}: {exc}")
+            JOB_QUEUE.record(job)
+            if job.attempts < job.max_attempts:
+                time.sleep(constants.JOB_RETRY_BACKOFF * job.attempts)
+
+    job.status = FAILED
+    JOB_QUEUE.record(job)
+    print(json.dumps({"event_type": "failed_job", "job": job.name}))
+    if job.on_failure:
+        try:
+            job.on_failure(last_exc)
+        except Exception as on_failure_exc:
+            logger.error(f"Error in failure handler for job {job.name}: {on_failure_exc}")
+
+
+def run_pending(logger: Logger) -> List[Job]:
+    """Runs every job enqueued on this thread, in the order they were enqueued."""
+    jobs = JOB_QUEUE.take_pending()
+    for job in jobs:
+        run_job(job, logger)
+    return jobs
@@ -0,0 +1,86 @@
+import re
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from threading import Lock
+from typing import Dict, List
+
+from sqlalchemy.engine import Row
+
+from utilities import constants
+from utilities.database import DbManager
+from utilities.database.orm import PaxminerAO, PaxminerUser
+
+HANDLE_SUFFIX_PATTERN = re.compile(r"\s\(([\s\S]*?\))")
+
+
+def normalize_user_handle(name: str) -> str:
+    """Lowercases a display name, drops any parenthetical suffix, and swaps spaces for underscores so it can be
+    matched against an @handle typed in a moleskine."""
+    return HANDLE_SUFFIX_PATTERN.sub("", name.lower()).replace(" ", "_")
+
+
+USER_COLUMNS = [PaxminerUser.user_id, PaxminerUser.user_name, PaxminerUser.real_name]
+AO_COLUMNS = [PaxminerAO.channel_id, PaxminerAO.ao]
+
+
+@dataclass
+class PaxminerDirectory:
+    user_records: List[Row]
+    channel_records: List[Row]
+    loaded_at: float = field(default_factory=time.monotonic)
+
+    def __post_init__(self):
+        self.users: Dict[str, Row] = {u.user_id: u for u in self.user_records}
+        self.aos: Dict[str, Row] = {a.channel_id: a for a in self.channel_records}
+        self.user_handles: Dict[str, str] = {
+            normalize_user_handle(u.user_name): u.user_id for u in self.user_records if u.user_name
+        }
+
+    def is_expired(self) -> bool:
+        return time.monotonic() - self.loaded_at > constants.PAXMINER_DIRECTORY_TTL
+
+
+DIRECTORY_CACHE: "OrderedDict[str, PaxminerDirectory]" = OrderedDict()
+DIRECTORY_CACHE_LOCK = Lock()
+
+
+def load_paxminer_directory(paxminer_schema: str) -> PaxminerDirectory:
+    with DbManager.transaction(schema=paxminer_schema) as tx:
+        user_records = tx.find_values(PaxminerUser, USER_COLUMNS, filters=[True])
+        channel_records = tx.find_values(PaxminerAO, AO_COLUMNS, filters=[True])
+    return PaxminerDirectory(user_records=user_records, channel_records=channel_records)
+
+
+def get_paxminer_directory(paxminer_schema: str) -> PaxminerDirectory:
+    """Returns the cached users and AOs for a PAXMiner schema, reloading them if the entry is missing or stale.
+
+    Args:
+        paxminer_schema (str): the region's PAXMiner schema
+
+    Returns:
+        PaxminerDirectory: the region's user and AO records, indexed by id
+    """
+    with DIRECTORY_CACHE_LOCK:
+        directory = DIRECTORY_CACHE.get(paxminer_schema)
+        if directory and not directory.is_expired():
+            DIRECTORY_CACHE.move_to_end(paxminer_schema)
+            return directory
+
+    directory = load_paxminer_directory(paxminer_schema)
+
+    with DIRECTORY_CACHE_LOCK:
+        DIRECTORY_CACHE[paxminer_schema] = directory
+        DIRECTORY_CACHE.move_to_end(paxminer_schema)
+        while len(DIRECTORY_CACHE) > constants.PAXMINER_DIRECTORY_MAX_REGIONS:
+            DIRECTORY_CACHE.popitem(last=False)
+    return directory
+
+
+def invalidate_paxminer_directory(paxminer_schema: str = None) -> None:
+    """Drops the cached directory for a schema (or every schema if none is given) so the next read reloads it."""
+    with DIRECTORY_CACHE_LOCK:
+        if paxminer_schema:
+            DIRECTORY_CACHE.pop(paxminer_schema, None)
+        else:
+            DIRECTORY_CACHE.clear()
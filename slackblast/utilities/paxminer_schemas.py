@@ -0,0 +1,201 @@
+import json
+import logging
+import os
+import pickle
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from logging import Logger
+from typing import Dict, List, Tuple
+
+from slack_sdk.web import WebClient
+
+from utilities import constants, jobs, tracing
+from utilities.database import DbManager
+from utilities.database.orm import PaxminerDiscoveryFailure, PaxminerRegion, PaxminerSchemaMapping, Region
+from utilities.region_cache import refresh_region_record
+from utilities.slack.directory import call_slack_api
+
+# Slack team id -> PAXMiner schema lookups are served from the paxminer_schema_mappings table. Teams that aren't in it
+# yet are found by a discovery job that asks Slack which workspace each unmapped PAXMiner region's token belongs to.
+# Regions whose token can't be identified are recorded in paxminer_discovery_failures and skipped for
+# PAXMINER_DISCOVERY_RETRY_AFTER_DAYS, and a job probes at most PAXMINER_DISCOVERY_MAX_REGIONS regions.
+#
+# The table is seeded from the old pickle file, and every PAXMiner region mapped, by utilities/database/migrations.py.
+# To do just that step (from the slackblast directory):
+#     python -m utilities.paxminer_schemas
+
+LEGACY_MAPPING_PATH = "data/paxminer_dict.pickle"
+
+
+def lookup_paxminer_schema(team_id: str) -> str:
+    return DbManager.get_value(PaxminerSchemaMapping, team_id, PaxminerSchemaMapping.paxminer_schema)
+
+
+def save_paxminer_schemas(mappings: Dict[str, str]):
+    """Inserts or replaces team id -> schema mappings.
+
+    Args:
+        mappings (Dict[str, str]): PAXMiner schema names keyed by Slack team id
+    """
+    with DbManager.transaction() as tx:
+        tx.delete_records(PaxminerSchemaMapping, filters=[PaxminerSchemaMapping.team_id.in_(list(mappings))])
+        tx.create_records(
+            [
+                PaxminerSchemaMapping(team_id=team_id, paxminer_schema=paxminer_schema)
+                for team_id, paxminer_schema in mappings.items()
+            ]
+        )
+
+
+def record_discovery_failures(failures: Dict[str, str], previous: Dict[str, PaxminerDiscoveryFailure]):
+    """Inserts or replaces the failure record for each region that couldn't be mapped.
+
+    Args:
+        failures (Dict[str, str]): error messages keyed by PAXMiner schema
+        previous (Dict[str, PaxminerDiscoveryFailure]): existing failure records, keyed by schema
+    """
+    with DbManager.transaction() as tx:
+        tx.delete_records(
+            PaxminerDiscoveryFailure, filters=[PaxminerDiscoveryFailure.paxminer_schema.in_(list(failures))]
+        )
+        tx.create_records(
+            [
+                PaxminerDiscoveryFailure(
+                    paxminer_schema=paxminer_schema,
+                    error=error[:255],
+                    attempts=(previous[paxminer_schema].attempts + 1) if paxminer_schema in previous else 1,
+                )
+                for paxminer_schema, error in failures.items()
+            ]
+        )
+
+
+def get_region_team_id(region: PaxminerRegion, logger: Logger) -> Tuple[str, str]:
+    """Asks Slack which workspace a PAXMiner region's token belongs to.
+
+    Returns:
+        Tuple[str, str]: the Slack team id, or None and the reason it couldn't be found
+    """
+    try:
+        client = WebClient(region.slack_token, timeout=constants.PAXMINER_DISCOVERY_TIMEOUT)
+        team_id = call_slack_api(client.auth_test, logger).get("team_id")
+        return (team_id, None) if team_id else (None, "auth.test returned no team_id")
+    except Exception as e:
+        logger.debug(f"Could not identify the workspace for PAXMiner region {region.schema_name}: {e}")
+        return None, str(e) or type(e).__name__
+
+
+def discover_paxminer_schemas(
+    logger: Logger, team_id: str = None, max_regions: int = constants.PAXMINER_DISCOVERY_MAX_REGIONS
+) -> Dict[str, str]:
+    """Maps PAXMiner regions that aren't in the mapping table yet to their Slack team ids, one auth.test call per
+    region on a bounded thread pool. Regions that failed within the last PAXMINER_DISCOVERY_RETRY_AFTER_DAYS are
+    skipped, and new failures are recorded. If `team_id` is one of the newly mapped teams and its region record has no
+    schema yet, the record is updated too.
+
+    Args:
+        logger (Logger): logger
+        team_id (str, optional): the team whose request triggered discovery
+        max_regions (int, optional): most regions to probe, never-probed regions first. Defaults to
+            PAXMINER_DISCOVERY_MAX_REGIONS; None probes every candidate.
+
+    Returns:
+        Dict[str, str]: the new mappings, PAXMiner schema names keyed by Slack team id
+    """
+    mapped_schemas = {
+        mapping.paxminer_schema for mapping in DbManager.find_records(PaxminerSchemaMapping, filters=[True])
+    }
+    failures: Dict[str, PaxminerDiscoveryFailure] = {
+        failure.paxminer_schema: failure for failure in DbManager.find_records(PaxminerDiscoveryFailure, filters=[True])
+    }
+    retry_before = datetime.utcnow() - timedelta(days=constants.PAXMINER_DISCOVERY_RETRY_AFTER_DAYS)
+    regions: List[PaxminerRegion] = [
+        region
+        for region in DbManager.find_records(PaxminerRegion, filters=[True], schema="paxminer")
+        if region.slack_token
+        and region.schema_name
+        and region.schema_name not in mapped_schemas
+        and (region.schema_name not in failures or failures[region.schema_name].updated < retry_before)
+    ]
+    # never-probed regions first, then the ones that failed longest ago
+    regions.sort(
+        key=lambda region: failures[region.schema_name].updated if region.schema_name in failures else datetime.min
+    )
+    deferred = len(regions) - len(regions[:max_regions])
+    regions = regions[:max_regions]
+    if not regions:
+        return {}
+
+    with ThreadPoolExecutor(max_workers=min(constants.PAXMINER_DISCOVERY_MAX_WORKERS, len(regions))) as executor:
+        results = list(executor.map(tracing.propagate(lambda region: get_region_team_id(region, logger)), regions))
+    mappings = {}
+    new_failures = {}
+    for region, (region_team_id, error) in zip(regions, results, strict=True):
+        if region_team_id:
+            mappings[region_team_id] = region.schema_name
+        else:
+            new_failures[region.schema_name] = error
+    if mappings:
+        save_paxminer_schemas(mappings)
+        DbManager.delete_records(
+            PaxminerDiscoveryFailure, filters=[PaxminerDiscoveryFailure.paxminer_schema.in_(list(mappings.values()))]
+        )
+    if new_failures:
+        record_discovery_failures(new_failures, failures)
+    print(
+        json.dumps(
+            {
+                "event_type": "paxminer_schema_discovery",
+                "regions": len(regions),
+                "mapped": len(mappings),
+                "failed": len(new_failures),
+                "deferred": deferred,
+            }
+        )
+    )
+
+    if team_id in mappings:
+        region_record: Region = DbManager.get_record(Region, id=team_id)
+        if region_record and not region_record.paxminer_schema:
+            DbManager.update_record(cls=Region, id=team_id, fields={Region.paxminer_schema: mappings[team_id]})
+            refresh_region_record(team_id)
+    return mappings
+
+
+def get_paxminer_schema(team_id: str, logger: Logger) -> str:
+    """Looks up a team's PAXMiner schema. On a miss, discovery is scheduled to run once the current request has been
+    handled, and the region record is updated if a schema is found.
+
+    Args:
+        team_id (str): slack internal team id
+        logger (Logger): logger
+
+    Returns:
+        str: the PAXMiner schema name, or None if the team isn't mapped (yet)
+    """
+    paxminer_schema = lookup_paxminer_schema(team_id)
+    if paxminer_schema:
+        logger.debug(f"PAXMiner schema for {team_id} is {paxminer_schema}")
+        return paxminer_schema
+
+    jobs.enqueue("paxminer_schema_discovery", discover_paxminer_schemas, max_attempts=1, logger=logger, team_id=team_id)
+    return None
+
+
+def import_legacy_mappings() -> Dict[str, str]:
+    if not os.path.exists(LEGACY_MAPPING_PATH):
+        return {}
+    with open(LEGACY_MAPPING_PATH, "rb") as f:
+        mappings = {team_id: schema for team_id, schema in pickle.load(f).items() if schema}
+    if mappings:
+        save_paxminer_schemas(mappings)
+    return mappings
+
+
+if __name__ == "__main__":
+    logger = logging.getLogger()
+    logger.setLevel(logging.INFO)
+    logger.addHandler(logging.StreamHandler())
+
+    logger.info(f"Imported {len(import_legacy_mappings())} mappings from {LEGACY_MAPPING_PATH}")
+    logger.info(f"Discovered {len(discover_paxminer_schemas(logger, max_regions=None))} new mappings")
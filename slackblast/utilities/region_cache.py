@@ -0,0 +1,99 @@
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from threading import Lock
+from typing import Dict, List
+
+from utilities import constants
+from utilities.database import DbManager
+from utilities.database.orm import Region
+
+# Region records are cached per team. After REGION_CACHE_TTL an entry is revalidated by reading only the row's
+# `updated` timestamp and reloading the row if it has moved, so config saved in one container reaches the others
+# without a full table reload. Entries are reloaded unconditionally after REGION_CACHE_MAX_AGE, since `updated` only
+# has one second resolution.
+
+
+@dataclass
+class CachedRegion:
+    record: Region
+    loaded_at: float = field(default_factory=time.monotonic)
+    checked_at: float = field(default_factory=time.monotonic)
+
+    @property
+    def version(self) -> datetime:
+        return self.record.updated
+
+    def needs_check(self) -> bool:
+        return time.monotonic() - self.checked_at > constants.REGION_CACHE_TTL
+
+    def is_expired(self) -> bool:
+        return time.monotonic() - self.loaded_at > constants.REGION_CACHE_MAX_AGE
+
+
+REGION_CACHE: Dict[str, CachedRegion] = {}
+REGION_CACHE_LOCK = Lock()
+
+
+def cache_region_record(region_record: Region) -> Region:
+    with REGION_CACHE_LOCK:
+        REGION_CACHE[region_record.team_id] = CachedRegion(record=region_record)
+    return region_record
+
+
+def refresh_region_record(team_id: str) -> Region:
+    """Reloads one team's region record from the database, e.g. right after its config is updated.
+
+    Args:
+        team_id (str): Slack team id
+
+    Returns:
+        Region: the fresh record, or None if the team has no region record
+    """
+    region_record: Region = DbManager.get_record(Region, id=team_id)
+    if region_record:
+        return cache_region_record(region_record)
+    with REGION_CACHE_LOCK:
+        REGION_CACHE.pop(team_id, None)
+    return None
+
+
+def get_cached_region_record(team_id: str) -> Region:
+    """Returns a team's region record, loading it on a miss and revalidating it against the row's `updated` timestamp
+    once the entry is older than REGION_CACHE_TTL.
+
+    Args:
+        team_id (str): Slack team id
+
+    Returns:
+        Region: the region record, or None if the team has no region record yet
+    """
+    with REGION_CACHE_LOCK:
+        entry = REGION_CACHE.get(team_id)
+
+    if not entry or entry.is_expired():
+        return refresh_region_record(team_id)
+
+    if entry.needs_check():
+        if DbManager.get_value(Region, team_id, Region.updated) != entry.version:
+            return refresh_region_record(team_id)
+        entry.checked_at = time.monotonic()
+
+    return entry.record
+
+
+def load_region_records() -> List[Region]:
+    """Loads every region record into the cache, e.g. to warm it when running locally."""
+    region_records: List[Region] = DbManager.find_records(Region, filters=[True])
+    for region_record in region_records:
+        cache_region_record(region_record)
+    return region_records
+
+
+def invalidate_region_record(team_id: str = None) -> None:
+    """Drops a team's cached record (or every record if no team is given) so the next read reloads it."""
+    with REGION_CACHE_LOCK:
+        if team_id:
+            REGION_CACHE.pop(team_id, None)
+        else:
+            REGION_CACHE.clear()
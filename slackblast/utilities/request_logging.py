@@ -0,0 +1,113 @@
+import json
+import os
+import random
+from logging import Logger
+from typing import Any, Dict
+
+from utilities import constants
+from utilities.helper_functions import safe_get
+from utilities.slack import actions
+
+# Every request gets a one line "request" event; the payload itself is only logged for a sample of requests (compact,
+# redacted and capped), and in full (still redacted) when the handler fails.
+#
+# REQUEST_LOG_SAMPLE_RATE sets the default rate between 0 and 1, and REQUEST_LOG_ROUTE_SAMPLE_RATES overrides it per
+# route id, e.g. "/backblast=1,team_join=0". Malformed values are ignored rather than failing every request.
+
+REDACTED = "[redacted]"
+# Form inputs whose values are secret. Their ids show up as values (block_id / action_id) rather than keys in
+# view.blocks, e.g. the decrypted SMTP password set as the email config form's initial_value.
+REDACTED_IDS = {actions.CONFIG_EMAIL_PASSWORD}
+ID_KEYS = ("type", "block_id", "action_id")
+
+
+def parse_sample_rate(value: str, default: float) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return default
+
+
+def parse_sample_rates(value: str) -> Dict[str, float]:
+    rates = {}
+    for item in (value or "").split(","):
+        route_id, _, rate = item.rpartition("=")
+        if route_id:
+            try:
+                rates[route_id.strip()] = float(rate)
+            except ValueError:
+                pass
+    return rates
+
+
+DEFAULT_SAMPLE_RATE = parse_sample_rate(
+    os.environ.get(constants.REQUEST_LOG_SAMPLE_RATE),
+    1.0 if constants.LOCAL_DEVELOPMENT else constants.REQUEST_LOG_DEFAULT_SAMPLE_RATE,
+)
+ROUTE_SAMPLE_RATES = parse_sample_rates(os.environ.get(constants.REQUEST_LOG_ROUTE_SAMPLE_RATES))
+
+
+def redact(data: Any, max_string_length: int = None) -> Any:
+    """Returns a copy of a Slack payload with credentials and short-lived urls/ids replaced, optionally truncating
+    long strings (e.g. moleskine text). Blocks and elements for a secret input keep only their type and ids.
+
+    Args:
+        data (Any): Slack payload, or any part of one
+        max_string_length (int, optional): strings longer than this are truncated. Defaults to no limit.
+
+    Returns:
+        Any: the redacted copy
+    """
+    if isinstance(data, dict):
+        if data.get("block_id") in REDACTED_IDS or data.get("action_id") in REDACTED_IDS:
+            return {key: value if key in ID_KEYS else REDACTED for key, value in data.items()}
+        return {
+            key: REDACTED if key in constants.REQUEST_LOG_REDACTED_FIELDS else redact(value, max_string_length)
+            for key, value in data.items()
+        }
+    elif isinstance(data, list):
+        return [redact(value, max_string_length) for value in data]
+    elif isinstance(data, str) and max_string_length and len(data) > max_string_length:
+        return f"{data[:max_string_length]}...[{len(data) - max_string_length} more]"
+    return data
+
+
+def serialize(body: dict, max_bytes: int = None) -> str:
+    text = json.dumps(body, separators=(",", ":"), default=str)
+    if max_bytes and len(text) > max_bytes:
+        text = f"{text[:max_bytes]}...[truncated {len(text) - max_bytes} chars]"
+    return text
+
+
+def should_sample(route_id: str) -> bool:
+    rate = ROUTE_SAMPLE_RATES.get(route_id, DEFAULT_SAMPLE_RATE)
+    return rate >= 1 or random.random() < rate
+
+
+def log_request(body: dict, request_type: str, route_id: str, logger: Logger):
+    """Logs a compact summary of the request, plus a capped, redacted copy of the payload if it is sampled."""
+    sampled = should_sample(route_id)
+    print(
+        json.dumps(
+            {
+                "event_type": "request",
+                "request_type": request_type,
+                "route_id": route_id,
+                "team_id": safe_get(body, "team_id") or safe_get(body, "team", "id"),
+                "user_id": safe_get(body, "user_id") or safe_get(body, "user", "id"),
+                "sampled": sampled,
+            }
+        )
+    )
+    if sampled:
+        logger.info(
+            serialize(
+                redact(body, max_string_length=constants.REQUEST_LOG_MAX_STRING_LENGTH),
+                max_bytes=constants.REQUEST_LOG_MAX_BYTES,
+            )
+        )
+
+
+def log_request_error(body: dict, logger: Logger):
+    """Logs the full (redacted, uncapped) payload of a request whose handler failed."""
+    logger.error(serialize(redact(body)))
@@ -1,5 +1,11 @@
-from features import backblast, config, custom_fields, preblast, strava, weaselbot, welcome
-from utilities import announcements, builders
+import json
+import time
+from dataclasses import dataclass, field
+from importlib import import_module
+from threading import Lock
+from typing import Callable, Dict, List, Tuple
+
+from utilities import constants
 from utilities.slack import actions
 
 # Required arguments for handler functions:
@@ -8,72 +14,209 @@ from utilities.slack import actions
 #     logger: Logger
 #     context: dict
 
-# The mappers define the function to be called for each event
+# The route lists define the function to be called for each event, as a dotted path to it
+# The function's module is only imported the first time the route is hit, which keeps feature dependencies (boto3,
+# requests_oauthlib, cryptography, ...) off the cold start path for requests that don't need them
 # The boolean value indicates whether a loading modal should be triggered before running the function
+# Route ids must be unique within a request type; this is checked when the router is built
+
+COMMAND_ROUTES = [
+    ("/backblast", "features.backblast.build_backblast_form", True),
+    ("/slackblast", "features.backblast.build_backblast_form", True),
+    ("/preblast", "features.preblast.build_preblast_form", True),
+    ("/config-welcome-message", "features.welcome.build_welcome_message_form", True),
+    ("/config-slackblast", "features.config.build_config_form", True),
+    ("/tag-achievement", "features.weaselbot.build_achievement_form", True),
+    ("/send-announcement", "utilities.announcements.send", False),
+]
+
+VIEW_ROUTES = [
+    (actions.BACKBLAST_CALLBACK_ID, "features.backblast.handle_backblast_post", False),
+    (actions.BACKBLAST_EDIT_CALLBACK_ID, "features.backblast.handle_backblast_post", False),
+    (actions.PREBLAST_CALLBACK_ID, "features.preblast.handle_preblast_post", False),
+    (actions.PREBLAST_EDIT_CALLBACK_ID, "features.preblast.handle_preblast_post", False),
+    (actions.WELCOME_MESSAGE_CONFIG_CALLBACK_ID, "features.welcome.handle_welcome_message_config_post", False),
+    (actions.CONFIG_GENERAL_CALLBACK_ID, "features.config.handle_config_general_post", False),
+    (actions.CONFIG_EMAIL_CALLBACK_ID, "features.config.handle_config_email_post", False),
+    (actions.STRAVA_MODIFY_CALLBACK_ID, "features.strava.handle_strava_modify", False),
+    (actions.CUSTOM_FIELD_ADD_CALLBACK_ID, "features.custom_fields.handle_custom_field_add", False),
+    (actions.CUSTOM_FIELD_MENU_CALLBACK_ID, "features.custom_fields.handle_custom_field_menu", False),
+    (actions.ACHIEVEMENT_CALLBACK_ID, "features.weaselbot.handle_achievements_tag", False),
+    (actions.WEASELBOT_CONFIG_CALLBACK_ID, "features.weaselbot.handle_config_form", False),
+    (actions.CONFIG_PAXMINER_CALLBACK_ID, "features.config.handle_config_paxminer_post", False),
+]
+
+ACTION_ROUTES = [
+    (actions.BACKBLAST_EDIT_BUTTON, "features.backblast.handle_backblast_edit_button", True),
+    (actions.BACKBLAST_NEW_BUTTON, "features.backblast.build_backblast_form", True),
+    (actions.BACKBLAST_STRAVA_BUTTON, "features.strava.build_strava_form", True),
+    (actions.BACKBLAST_AO, "features.backblast.build_backblast_form", False),
+    (actions.BACKBLAST_DATE, "features.backblast.build_backblast_form", False),
+    (actions.BACKBLAST_Q, "features.backblast.build_backblast_form", False),
+    # (actions.CONFIG_EMAIL_ENABLE, "features.config.build_config_form", False),
+    (actions.STRAVA_CONNECT_BUTTON, "utilities.builders.ignore_event", False),
+    (actions.CONFIG_CUSTOM_FIELDS, "features.custom_fields.build_custom_field_menu", False),
+    (actions.CUSTOM_FIELD_ADD, "features.custom_fields.build_custom_field_add_edit", False),
+    (actions.CUSTOM_FIELD_EDIT, "features.custom_fields.build_custom_field_add_edit", False),
+    (actions.CUSTOM_FIELD_DELETE, "features.custom_fields.delete_custom_field", False),
+    (actions.PREBLAST_NEW_BUTTON, "features.preblast.build_preblast_form", True),
+    (actions.PREBLAST_EDIT_BUTTON, "features.preblast.handle_preblast_edit_button", True),
+    (actions.CONFIG_WEASELBOT, "features.weaselbot.build_config_form", False),
+    (actions.CONFIG_EMAIL, "features.config.build_config_email_form", False),
+    (actions.CONFIG_GENERAL, "features.config.build_config_general_form", False),
+    (actions.CONFIG_WELCOME_MESSAGE, "features.welcome.build_welcome_config_form", False),
+    (actions.CONFIG_PAXMINER, "features.config.build_config_paxminer_form", False),
+]
+
+# Matched by prefix, for action ids with a dynamic suffix (e.g. "strava-activity-<activity id>")
+ACTION_PREFIX_ROUTES = [
+    (actions.STRAVA_ACTIVITY_BUTTON, "features.strava.build_strava_modify_form", False),
+]
+
+VIEW_CLOSED_ROUTES = [
+    (actions.CUSTOM_FIELD_ADD_FORM, "utilities.builders.ignore_event", False),
+    (actions.STRAVA_MODIFY_CALLBACK_ID, "features.strava.handle_strava_modify", False),
+]
+
+EVENT_ROUTES = [
+    ("team_join", "features.welcome.handle_team_join", False),
+]
+
+
+def load_handler(path: str) -> Callable:
+    """Imports and returns a function from its dotted path, e.g. "features.backblast.build_backblast_form"."""
+    module_path, _, name = path.rpartition(".")
+    return getattr(import_module(module_path), name)
+
+
+@dataclass
+class Route:
+    request_type: str
+    route_id: str
+    handler_path: str
+    add_loading: bool
+    hits: int = 0
+    total_time: float = 0.0
+    max_time: float = 0.0
+    _handler: Callable = field(default=None, repr=False)
+
+    @property
+    def handler(self) -> Callable:
+        if not self._handler:
+            self._handler = load_handler(self.handler_path)
+        return self._handler
+
+
+class PrefixTrie:
+    def __init__(self):
+        self.root = {}
+
+    def insert(self, prefix: str, route: Route):
+        node = self.root
+        for char in prefix:
+            node = node.setdefault(char, {})
+        if None in node:
+            raise ValueError(f"Duplicate prefix route for {route.request_type}: {prefix}")
+        node[None] = route
+
+    def longest_match(self, key: str) -> Route:
+        node = self.root
+        match = node.get(None)
+        for char in key:
+            node = node.get(char)
+            if node is None:
+                break
+            match = node.get(None, match)
+        return match
+
+
+class Router:
+    """Resolves a (request type, route id) pair to its handler: exact ids are a dict lookup, and ids with a dynamic
+    suffix fall back to a longest-prefix match. Also keeps hit counts and latency per route."""
+
+    def __init__(
+        self,
+        routes: Dict[str, List[Tuple[str, str, bool]]],
+        prefix_routes: Dict[str, List[Tuple[str, str, bool]]] = None,
+    ):
+        self.exact: Dict[Tuple[str, str], Route] = {}
+        self.prefixes: Dict[str, PrefixTrie] = {}
+        self.lock = Lock()
+        self.stats_logged_at = time.monotonic()
+        for request_type, route_list in routes.items():
+            for route_id, handler_path, add_loading in route_list:
+                if (request_type, route_id) in self.exact:
+                    raise ValueError(f"Duplicate route for {request_type}: {route_id}")
+                self.exact[(request_type, route_id)] = Route(request_type, route_id, handler_path, add_loading)
+        for request_type, route_list in (prefix_routes or {}).items():
+            trie = self.prefixes.setdefault(request_type, PrefixTrie())
+            for prefix, handler_path, add_loading in route_list:
+                trie.insert(prefix, Route(request_type, prefix, handler_path, add_loading))
+
+    def resolve(self, request_type: str, route_id: str) -> Route:
+        route = self.exact.get((request_type, route_id))
+        if not route and request_type in self.prefixes and route_id:
+            route = self.prefixes[request_type].longest_match(route_id)
+        return route
+
+    def routes(self) -> List[Route]:
+        return list(self.exact.values()) + [
+            route for trie in self.prefixes.values() for route in _trie_routes(trie.root)
+        ]
+
+    def load_all(self):
+        """Imports every handler up front, so a bad dotted path fails fast (used in local development)."""
+        for route in self.routes():
+            load_handler(route.handler_path)
+
+    def record(self, route: Route, elapsed: float):
+        with self.lock:
+            route.hits += 1
+            route.total_time += elapsed
+            route.max_time = max(route.max_time, elapsed)
+
+    def stats(self) -> List[Dict[str, object]]:
+        return [
+            {
+                "request_type": route.request_type,
+                "route_id": route.route_id,
+                "hits": route.hits,
+                "avg_time": route.total_time / route.hits,
+                "max_time": route.max_time,
+            }
+            for route in self.routes()
+            if route.hits
+        ]
+
+    def log_stats_if_due(self, interval: float = constants.ROUTE_STATS_INTERVAL):
+        """Prints the per-route stats as a "route_stats" event, at most once every `interval` seconds per container."""
+        now = time.monotonic()
+        with self.lock:
+            if now - self.stats_logged_at < interval:
+                return
+            self.stats_logged_at = now
+        print(json.dumps({"event_type": "route_stats", "routes": self.stats()}))
+
+
+def _trie_routes(node: dict) -> List[Route]:
+    routes = []
+    for key, child in node.items():
+        if key is None:
+            routes.append(child)
+        else:
+            routes.extend(_trie_routes(child))
+    return routes
+
 
-COMMAND_MAPPER = {
-    "/backblast": (backblast.build_backblast_form, True),
-    "/slackblast": (backblast.build_backblast_form, True),
-    "/preblast": (preblast.build_preblast_form, True),
-    "/config-welcome-message": (welcome.build_welcome_message_form, True),
-    "/config-slackblast": (config.build_config_form, True),
-    "/tag-achievement": (weaselbot.build_achievement_form, True),
-    "/send-announcement": (announcements.send, False),
-}
-
-VIEW_MAPPER = {
-    actions.BACKBLAST_CALLBACK_ID: (backblast.handle_backblast_post, False),
-    actions.BACKBLAST_EDIT_CALLBACK_ID: (backblast.handle_backblast_post, False),
-    actions.PREBLAST_CALLBACK_ID: (preblast.handle_preblast_post, False),
-    actions.PREBLAST_EDIT_CALLBACK_ID: (preblast.handle_preblast_post, False),
-    actions.WELCOME_MESSAGE_CONFIG_CALLBACK_ID: (welcome.handle_welcome_message_config_post, False),
-    actions.CONFIG_GENERAL_CALLBACK_ID: (config.handle_config_general_post, False),
-    actions.CONFIG_EMAIL_CALLBACK_ID: (config.handle_config_email_post, False),
-    actions.STRAVA_MODIFY_CALLBACK_ID: (strava.handle_strava_modify, False),
-    actions.CUSTOM_FIELD_ADD_CALLBACK_ID: (custom_fields.handle_custom_field_add, False),
-    actions.CUSTOM_FIELD_MENU_CALLBACK_ID: (custom_fields.handle_custom_field_menu, False),
-    actions.ACHIEVEMENT_CALLBACK_ID: (weaselbot.handle_achievements_tag, False),
-    actions.WEASELBOT_CONFIG_CALLBACK_ID: (weaselbot.handle_config_form, False),
-    actions.CONFIG_PAXMINER_CALLBACK_ID: (config.handle_config_paxminer_post, False),
-}
-
-ACTION_MAPPER = {
-    actions.BACKBLAST_EDIT_BUTTON: (backblast.handle_backblast_edit_button, True),
-    actions.BACKBLAST_NEW_BUTTON: (backblast.build_backblast_form, True),
-    actions.BACKBLAST_STRAVA_BUTTON: (strava.build_strava_form, True),
-    actions.STRAVA_ACTIVITY_BUTTON: (strava.build_strava_modify_form, False),
-    actions.BACKBLAST_AO: (backblast.build_backblast_form, False),
-    actions.BACKBLAST_DATE: (backblast.build_backblast_form, False),
-    actions.BACKBLAST_Q: (backblast.build_backblast_form, False),
-    # actions.CONFIG_EMAIL_ENABLE: (config.build_config_form, False),
-    actions.STRAVA_CONNECT_BUTTON: (builders.ignore_event, False),
-    actions.CONFIG_CUSTOM_FIELDS: (custom_fields.build_custom_field_menu, False),
-    actions.CUSTOM_FIELD_ADD: (custom_fields.build_custom_field_add_edit, False),
-    actions.CUSTOM_FIELD_EDIT: (custom_fields.build_custom_field_add_edit, False),
-    actions.CUSTOM_FIELD_DELETE: (custom_fields.delete_custom_field, False),
-    actions.PREBLAST_NEW_BUTTON: (preblast.build_preblast_form, True),
-    actions.PREBLAST_EDIT_BUTTON: (preblast.handle_preblast_edit_button, True),
-    actions.CONFIG_WEASELBOT: (weaselbot.build_config_form, False),
-    actions.CONFIG_WELCOME_MESSAGE: (welcome.build_welcome_message_form, False),
-    actions.CONFIG_EMAIL: (config.build_config_email_form, False),
-    actions.CONFIG_GENERAL: (config.build_config_general_form, False),
-    actions.CONFIG_WELCOME_MESSAGE: (welcome.build_welcome_config_form, False),
-    actions.CONFIG_PAXMINER: (config.build_config_paxminer_form, False),
-}
-
-VIEW_CLOSED_MAPPER = {
-    actions.CUSTOM_FIELD_ADD_FORM: (builders.ignore_event, False),
-    actions.STRAVA_MODIFY_CALLBACK_ID: (strava.handle_strava_modify, False),
-}
-
-EVENT_MAPPER = {
-    "team_join": (welcome.handle_team_join, False),
-}
-
-MAIN_MAPPER = {
-    "command": COMMAND_MAPPER,
-    "block_actions": ACTION_MAPPER,
-    "view_submission": VIEW_MAPPER,
-    "view_closed": VIEW_CLOSED_MAPPER,
-    "event_callback": EVENT_MAPPER,
-}
+ROUTER = Router(
+    routes={
+        "command": COMMAND_ROUTES,
+        "block_actions": ACTION_ROUTES,
+        "view_submission": VIEW_ROUTES,
+        "view_closed": VIEW_CLOSED_ROUTES,
+        "event_callback": EVENT_ROUTES,
+    },
+    prefix_routes={
+        "block_actions": ACTION_PREFIX_ROUTES,
+    },
+)
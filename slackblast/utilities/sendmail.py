@@ -1,7 +1,20 @@
+import hashlib
+import os
 import smtplib
+import time
 from email.message import EmailMessage
 from pathlib import Path
-from typing import Any, Dict, List
+from threading import Lock
+from typing import Any, Dict, List, Tuple
+
+from utilities import constants, tracing
+
+SmtpKey = Tuple[str, int, str, str]
+
+# authenticated connections kept open between sends, keyed by (server, port, user, password hash) so a connection is
+# only reused by a caller holding the same credentials it was authenticated with
+SMTP_POOL: Dict[SmtpKey, Tuple[smtplib.SMTP, float]] = {}
+SMTP_POOL_LOCK = Lock()
 
 
 def send(
@@ -13,6 +26,7 @@ def send(
     email_password: str,
     email_to: str,
     attachments: List[Dict[str, Any]],
+    attachment_limit: int = constants.EMAIL_ATTACHMENT_LIMIT,
 ):
     """Construct and sends an email.
 
@@ -25,8 +39,70 @@ def send(
         email_password (str): email password
         email_to (str): email recipient address
         attachments (List[Dict[str, Any]]): list of attachments, each attachment is a dict with keys "filepath" and
-            "meta", where meta includes filename, maintype, and subtype
+            "meta", where meta includes filename, maintype, and subtype. Optional keys "low_res_filepath" /
+            "low_res_meta" give a smaller fallback and "url" a link to use if neither fits under attachment_limit
+        attachment_limit (int, optional): max total attachment size in bytes. Defaults to EMAIL_ATTACHMENT_LIMIT.
+    """
+    msg = build_message(subject, body, email_user, email_to, attachments, attachment_limit)
+
+    if email_server and email_server_port and email_user and email_password and email_to:
+        send_batch([msg], email_server, email_server_port, email_user, email_password)
+
+
+def fit_attachments(
+    attachments: List[Dict[str, Any]], attachment_limit: int = None
+) -> Tuple[List[Tuple[str, Dict[str, str]]], List[str]]:
+    """Picks the best set of files that fits the limit as a whole: every original if they all fit, otherwise every
+    file's low res version (where it has one) if those all fit, otherwise each file's smallest version, in order,
+    while it still fits under the remaining budget, and a link to each file that does not.
+
+    Args:
+        attachments (List[Dict[str, Any]]): attachments, as passed to send
+        attachment_limit (int, optional): max total size in bytes; no limit if None
+
+    Returns:
+        Tuple[List[Tuple[str, Dict[str, str]]], List[str]]: (filepath, meta) pairs to attach, and urls to link
     """
+    originals = [(file["filepath"], file["meta"]) for file in attachments]
+    if attachment_limit is None or total_size(originals) <= attachment_limit:
+        return originals, []
+
+    smallest = [
+        (file["low_res_filepath"], file["low_res_meta"]) if file.get("low_res_filepath") else original
+        for file, original in zip(attachments, originals, strict=True)
+    ]
+    if total_size(smallest) <= attachment_limit:
+        return smallest, []
+
+    remaining = attachment_limit
+    chosen = []
+    links = []
+    for file, (filepath, meta) in zip(attachments, smallest, strict=True):
+        size = os.path.getsize(filepath)
+        if size <= remaining:
+            chosen.append((filepath, meta))
+            remaining -= size
+        elif file.get("url"):
+            links.append(file["url"])
+    return chosen, links
+
+
+def total_size(files: List[Tuple[str, Dict[str, str]]]) -> int:
+    return sum(os.path.getsize(filepath) for filepath, _ in files)
+
+
+def build_message(
+    subject: str,
+    body: str,
+    email_user: str,
+    email_to: str,
+    attachments: List[Dict[str, Any]],
+    attachment_limit: int = None,
+) -> EmailMessage:
+    chosen, links = fit_attachments(attachments, attachment_limit)
+    if links:
+        body += "\n\nPhotos:\n" + "\n".join(links)
+
     msg = EmailMessage()
     msg.set_content(body)
 
@@ -34,13 +110,94 @@ def send(
     msg["From"] = email_user
     msg["To"] = email_to
 
-    for file in attachments:
-        with Path(file["filepath"]).open("rb") as f:
-            msg.add_attachment(f.read(), **file["meta"])
+    for filepath, meta in chosen:
+        with Path(filepath).open("rb") as f:
+            msg.add_attachment(f.read(), **meta)
+    return msg
 
-    if email_server and email_server_port and email_user and email_password and email_to:
-        server = smtplib.SMTP(email_server, email_server_port)
-        server.starttls()
-        server.login(email_user, email_password)
-        server.send_message(msg)
+
+@tracing.traced("smtp.send")
+def send_batch(
+    messages: List[EmailMessage], email_server: str, email_server_port: int, email_user: str, email_password: str
+):
+    """Sends several messages over one pooled, authenticated SMTP connection. If the server has dropped the
+    connection, it is re-established once and the unsent messages are retried.
+
+    Args:
+        messages (List[EmailMessage]): messages to send
+        email_server (str): email server
+        email_server_port (int): email server port
+        email_user (str): email user address
+        email_password (str): email password
+    """
+    key = pool_key(email_server, email_server_port, email_user, email_password)
+    server = checkout_connection(key, email_password)
+    try:
+        for index, msg in enumerate(messages):
+            try:
+                server.send_message(msg)
+            except smtplib.SMTPServerDisconnected:
+                close_quietly(server)
+                server = connect(key, email_password)
+                for retry_msg in messages[index:]:
+                    server.send_message(retry_msg)
+                break
+    except Exception:
+        close_quietly(server)
+        raise
+    checkin_connection(key, server)
+
+
+def pool_key(email_server: str, email_server_port: int, email_user: str, email_password: str) -> SmtpKey:
+    password_hash = hashlib.sha256(email_password.encode()).hexdigest()
+    return (email_server, int(email_server_port), email_user, password_hash)
+
+
+@tracing.traced("smtp.connect")
+def connect(key: SmtpKey, email_password: str) -> smtplib.SMTP:
+    email_server, email_server_port, email_user, _ = key
+    server = smtplib.SMTP(email_server, email_server_port, timeout=constants.SMTP_TIMEOUT)
+    server.starttls()
+    server.login(email_user, email_password)
+    return server
+
+
+def is_alive(server: smtplib.SMTP) -> bool:
+    try:
+        return server.noop()[0] == 250
+    except (smtplib.SMTPException, OSError):
+        return False
+
+
+def close_quietly(server: smtplib.SMTP):
+    try:
+        server.quit()
+    except (smtplib.SMTPException, OSError):
         server.close()
+
+
+def checkout_connection(key: SmtpKey, email_password: str) -> smtplib.SMTP:
+    """Takes an idle connection for `key` out of the pool if one is still fresh and answers a NOOP, otherwise opens
+    and authenticates a new one. A checked out connection is never shared between threads."""
+    with SMTP_POOL_LOCK:
+        server, last_used = SMTP_POOL.pop(key, (None, None))
+    if server and (time.monotonic() - last_used > constants.SMTP_IDLE_TIMEOUT or not is_alive(server)):
+        close_quietly(server)
+        server = None
+    return server or connect(key, email_password)
+
+
+def checkin_connection(key: SmtpKey, server: smtplib.SMTP):
+    with SMTP_POOL_LOCK:
+        previous = SMTP_POOL.pop(key, None)
+        SMTP_POOL[key] = (server, time.monotonic())
+    if previous:
+        close_quietly(previous[0])
+
+
+def close_idle_connections():
+    with SMTP_POOL_LOCK:
+        connections = list(SMTP_POOL.values())
+        SMTP_POOL.clear()
+    for server, _ in connections:
+        close_quietly(server)
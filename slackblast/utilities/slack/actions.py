@@ -48,11 +48,13 @@ CONFIG_EMAIL_FROM = "email_from"
 CONFIG_EMAIL_TO = "email_to"
 CONFIG_EMAIL_PASSWORD = "email_password"
 CONFIG_POSTIE_ENABLE = "postie_enable"
+CONFIG_EMAIL_ATTACHMENT_LIMIT = "email_attachment_limit"
 CONFIG_CALLBACK_ID = "config-id"
 CONFIG_PAXMINER_DB = "paxminer_db"
 CONFIG_PAXMINER_DB_OTHER = "paxminer_db_other"
 CONFIG_PASSWORD_CONTEXT = "password_context"
 CONFIG_POSTIE_CONTEXT = "postie_context"
+CONFIG_EMAIL_ATTACHMENT_CONTEXT = "email_attachment_context"
 CONFIG_EDITING_LOCKED = "editing_locked"
 CONFIG_DEFAULT_DESTINATION = "default_destination"
 CONFIG_BACKBLAST_MOLESKINE_TEMPLATE = "backblast_moleskine_template"
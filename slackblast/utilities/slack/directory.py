@@ -0,0 +1,220 @@
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from logging import Logger
+from threading import Lock
+from typing import Any, Callable, Dict, List
+
+from slack_sdk.errors import SlackApiError
+from slack_sdk.web import WebClient
+
+from utilities import constants, tracing
+
+
+def _is_expired(loaded_at: float, retry_after: float, ttl: int) -> bool:
+    now = time.monotonic()
+    if retry_after is not None and now < retry_after:
+        return False
+    return loaded_at is None or now - loaded_at > ttl
+
+
+@dataclass
+class SlackDirectory:
+    users: Dict[str, Dict[str, Any]] = field(default_factory=dict)
+    channels: Dict[str, Dict[str, Any]] = field(default_factory=dict)
+    channel_ids_by_name: Dict[str, str] = field(default_factory=dict)
+    users_loaded_at: float = None
+    channels_loaded_at: float = None
+    # after a failed list call, don't try again until this monotonic time
+    users_retry_after: float = None
+    channels_retry_after: float = None
+    accessed_at: float = field(default_factory=time.monotonic)
+
+    def users_expired(self) -> bool:
+        return _is_expired(self.users_loaded_at, self.users_retry_after, constants.SLACK_DIRECTORY_TTL)
+
+    def channels_expired(self, ttl: int = constants.SLACK_DIRECTORY_TTL) -> bool:
+        return _is_expired(self.channels_loaded_at, self.channels_retry_after, ttl)
+
+
+# keyed by bot token, which is unique per workspace; least recently used workspaces are evicted past
+# SLACK_DIRECTORY_MAX_WORKSPACES, and workspaces idle for longer than SLACK_DIRECTORY_TTL are dropped
+SLACK_DIRECTORIES: "OrderedDict[str, SlackDirectory]" = OrderedDict()
+SLACK_DIRECTORIES_LOCK = Lock()
+
+
+def call_slack_api(method: Callable, logger: Logger, **kwargs):
+    """Calls a WebClient method, sleeping and retrying when Slack responds with a 429 and a Retry-After header.
+
+    Args:
+        method (Callable): bound WebClient method, e.g. client.users_info
+        logger (Logger): logger
+
+    Returns:
+        SlackResponse: the method's response
+    """
+    for attempt in range(constants.SLACK_MAX_RETRIES + 1):
+        try:
+            return method(**kwargs)
+        except SlackApiError as e:
+            if e.response.status_code != 429 or attempt == constants.SLACK_MAX_RETRIES:
+                raise
+            headers = {k.lower(): v for k, v in (e.response.headers or {}).items()}
+            retry_after = int(headers.get("retry-after", 1))
+            logger.warning(f"Rate limited on {method.__name__}, retrying in {retry_after}s")
+            time.sleep(retry_after)
+
+
+def list_all(method: Callable, key: str, logger: Logger, **kwargs) -> List[Dict[str, Any]]:
+    """Walks every page of a cursor-paginated Slack list method (users.list, conversations.list, ...)."""
+    items = []
+    cursor = None
+    while True:
+        response = call_slack_api(method, logger, limit=constants.SLACK_LIST_PAGE_SIZE, cursor=cursor, **kwargs)
+        items.extend(response.get(key) or [])
+        cursor = (response.get("response_metadata") or {}).get("next_cursor")
+        if not cursor:
+            return items
+
+
+def get_slack_directory(client: WebClient) -> SlackDirectory:
+    now = time.monotonic()
+    with SLACK_DIRECTORIES_LOCK:
+        for token, directory in list(SLACK_DIRECTORIES.items()):
+            if now - directory.accessed_at > constants.SLACK_DIRECTORY_TTL:
+                del SLACK_DIRECTORIES[token]
+
+        directory = SLACK_DIRECTORIES.get(client.token)
+        if directory is None:
+            directory = SLACK_DIRECTORIES[client.token] = SlackDirectory()
+        directory.accessed_at = now
+        SLACK_DIRECTORIES.move_to_end(client.token)
+        while len(SLACK_DIRECTORIES) > constants.SLACK_DIRECTORY_MAX_WORKSPACES:
+            SLACK_DIRECTORIES.popitem(last=False)
+        return directory
+
+
+def _fetch_missing(ids: List[str], fetch: Callable[[str], Dict[str, Any]], logger: Logger) -> Dict[str, Any]:
+    def safe_fetch(id):
+        try:
+            return fetch(id)
+        except Exception as e:
+            logger.error(f"Error looking up {id}: {e}")
+            return None
+
+    with ThreadPoolExecutor(max_workers=min(constants.SLACK_MAX_WORKERS, len(ids))) as executor:
+        results = executor.map(tracing.propagate(safe_fetch), ids)
+    return {id: result for id, result in zip(ids, results, strict=True) if result}
+
+
+def _load_channels(directory: SlackDirectory, client: WebClient, logger: Logger):
+    try:
+        channels = list_all(client.conversations_list, "channels", logger, exclude_archived=True)
+    except Exception as e:
+        logger.error(f"Error loading conversations list: {e}")
+        with SLACK_DIRECTORIES_LOCK:
+            directory.channels_retry_after = time.monotonic() + constants.SLACK_DIRECTORY_FAILURE_BACKOFF
+        return
+
+    with SLACK_DIRECTORIES_LOCK:
+        directory.channels = {channel["id"]: channel for channel in channels}
+        directory.channel_ids_by_name = {channel["name"]: channel["id"] for channel in channels}
+        directory.channels_loaded_at = time.monotonic()
+        directory.channels_retry_after = None
+
+
+def _load_users(directory: SlackDirectory, client: WebClient, logger: Logger):
+    try:
+        members = list_all(client.users_list, "members", logger)
+    except Exception as e:
+        logger.error(f"Error loading users list: {e}")
+        with SLACK_DIRECTORIES_LOCK:
+            directory.users_retry_after = time.monotonic() + constants.SLACK_DIRECTORY_FAILURE_BACKOFF
+        return
+
+    with SLACK_DIRECTORIES_LOCK:
+        directory.users = {member["id"]: member for member in members}
+        directory.users_loaded_at = time.monotonic()
+        directory.users_retry_after = None
+
+
+def get_slack_users(user_ids: List[str], client: WebClient, logger: Logger) -> Dict[str, Dict[str, Any]]:
+    """Resolves Slack user objects, serving from the workspace's users.list cache and falling back to concurrent
+    users.info calls for anyone not in it.
+
+    Args:
+        user_ids (List[str]): Slack user ids
+        client (WebClient): Slack client
+        logger (Logger): logger
+
+    Returns:
+        Dict[str, Dict[str, Any]]: user objects keyed by user id; ids that could not be resolved are omitted
+    """
+    if not user_ids:
+        return {}
+
+    directory = get_slack_directory(client)
+    if directory.users_expired():
+        _load_users(directory, client, logger)
+
+    missing = list({user_id for user_id in user_ids if user_id not in directory.users})
+    if missing:
+        fetched = _fetch_missing(missing, lambda id: call_slack_api(client.users_info, logger, user=id)["user"], logger)
+        with SLACK_DIRECTORIES_LOCK:
+            directory.users.update(fetched)
+    users = directory.users
+    return {user_id: users[user_id] for user_id in user_ids if user_id in users}
+
+
+def get_slack_channels(channel_ids: List[str], client: WebClient, logger: Logger) -> Dict[str, Dict[str, Any]]:
+    """Resolves Slack channel objects, serving from the workspace's conversations.list cache and falling back to
+    concurrent conversations.info calls (e.g. for private channels) for anything not in it.
+
+    Args:
+        channel_ids (List[str]): Slack channel ids
+        client (WebClient): Slack client
+        logger (Logger): logger
+
+    Returns:
+        Dict[str, Dict[str, Any]]: channel objects keyed by channel id; ids that could not be resolved are omitted
+    """
+    if not channel_ids:
+        return {}
+
+    directory = get_slack_directory(client)
+    if directory.channels_expired():
+        _load_channels(directory, client, logger)
+
+    missing = list({channel_id for channel_id in channel_ids if channel_id not in directory.channels})
+    if missing:
+        fetched = _fetch_missing(
+            missing, lambda id: call_slack_api(client.conversations_info, logger, channel=id)["channel"], logger
+        )
+        with SLACK_DIRECTORIES_LOCK:
+            directory.channels.update(fetched)
+    channels = directory.channels
+    return {channel_id: channels[channel_id] for channel_id in channel_ids if channel_id in channels}
+
+
+def get_slack_channel_id(name: str, client: WebClient, logger: Logger) -> str:
+    """Looks up a channel id by name from the workspace's cached conversations.list index. On a miss the index is
+    rebuilt, at most once per SLACK_CHANNEL_MISS_REFRESH seconds, in case the channel was created or renamed.
+
+    Args:
+        name (str): channel name, without the leading #
+        client (WebClient): Slack client
+        logger (Logger): logger
+
+    Returns:
+        str: the channel id, or None if no such channel exists
+    """
+    directory = get_slack_directory(client)
+    if directory.channels_expired():
+        _load_channels(directory, client, logger)
+
+    channel_id = directory.channel_ids_by_name.get(name)
+    if not channel_id and directory.channels_expired(ttl=constants.SLACK_CHANNEL_MISS_REFRESH):
+        _load_channels(directory, client, logger)
+        channel_id = directory.channel_ids_by_name.get(name)
+    return channel_id
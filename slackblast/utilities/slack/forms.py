@@ -278,6 +278,19 @@ CONFIG_EMAIL_FORM = orm.BlockView(
             optional=False,
             element=orm.PlainTextInputElement(initial_value="example_destination@gmail.com"),
         ),
+        orm.InputBlock(
+            label="Max Total Attachment Size (MB)",
+            action=actions.CONFIG_EMAIL_ATTACHMENT_LIMIT,
+            optional=True,
+            element=orm.PlainTextInputElement(placeholder="10"),
+        ),
+        orm.ContextBlock(
+            action=actions.CONFIG_EMAIL_ATTACHMENT_CONTEXT,
+            element=orm.ContextElement(
+                initial_value="Photos that don't fit under this limit are attached in low resolution, or linked in the "
+                "email body instead.",
+            ),
+        ),
         orm.InputBlock(
             label="Use Postie formatting for categories?",
             action=actions.CONFIG_POSTIE_ENABLE,
@@ -0,0 +1,163 @@
+import json
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from functools import wraps
+from threading import Lock
+from typing import Callable, Dict, Iterator
+from uuid import uuid4
+
+from slack_sdk.web import WebClient
+
+# Spans are only emitted inside a trace, which app.main_response opens for each request. Every finished span is
+# printed as a structured "span" event, and a "trace" event with the per-span-name totals is printed when the
+# request finishes, so a slow route can be broken down into Slack, DB, S3, SMTP and Strava time.
+
+
+@dataclass
+class Trace:
+    request_type: str
+    route_id: str
+    trace_id: str = field(default_factory=lambda: uuid4().hex)
+    totals: Dict[str, float] = field(default_factory=dict)
+    counts: Dict[str, int] = field(default_factory=dict)
+    lock: Lock = field(default_factory=Lock)
+
+
+CURRENT_TRACE: ContextVar[Trace] = ContextVar("current_trace", default=None)
+CURRENT_SPAN: ContextVar[str] = ContextVar("current_span", default=None)
+
+
+def _ms(seconds: float) -> float:
+    return round(seconds * 1000, 2)
+
+
+def record_span(name: str, elapsed: float, parent: str = None, error: bool = False, **attributes):
+    """Records a finished span on the current trace. Does nothing outside of a trace.
+
+    Args:
+        name (str): span name, e.g. "slack.api" or "db.query"
+        elapsed (float): span duration in seconds
+        parent (str, optional): name of the enclosing span. Defaults to the current span.
+        error (bool, optional): whether the spanned operation raised. Defaults to False.
+    """
+    trace = CURRENT_TRACE.get()
+    if not trace:
+        return
+    with trace.lock:
+        trace.totals[name] = trace.totals.get(name, 0.0) + elapsed
+        trace.counts[name] = trace.counts.get(name, 0) + 1
+    print(
+        json.dumps(
+            {
+                "event_type": "span",
+                "trace_id": trace.trace_id,
+                "request_type": trace.request_type,
+                "route_id": trace.route_id,
+                "span": name,
+                "parent": parent or CURRENT_SPAN.get(),
+                "duration_ms": _ms(elapsed),
+                "error": error,
+                **attributes,
+            },
+            default=str,
+        )
+    )
+
+
+@contextmanager
+def span(name: str, **attributes) -> Iterator[None]:
+    """Times the enclosed block as a child of the current span.
+
+    Usage:
+        with tracing.span("s3.upload", key=file_name):
+            ...
+    """
+    parent = CURRENT_SPAN.get()
+    token = CURRENT_SPAN.set(name)
+    start = time.perf_counter()
+    error = False
+    try:
+        yield
+    except Exception:
+        error = True
+        raise
+    finally:
+        CURRENT_SPAN.reset(token)
+        record_span(name, time.perf_counter() - start, parent=parent, error=error, **attributes)
+
+
+def traced(name: str) -> Callable:
+    """Decorator form of `span`."""
+
+    def decorator(func: Callable) -> Callable:
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+@contextmanager
+def trace(request_type: str, route_id: str) -> Iterator[Trace]:
+    """Opens a trace for one request and prints its summary when the block exits."""
+    current = Trace(request_type=request_type, route_id=route_id)
+    token = CURRENT_TRACE.set(current)
+    start = time.perf_counter()
+    try:
+        yield current
+    finally:
+        elapsed = time.perf_counter() - start
+        CURRENT_TRACE.reset(token)
+        print(
+            json.dumps(
+                {
+                    "event_type": "trace",
+                    "trace_id": current.trace_id,
+                    "request_type": request_type,
+                    "route_id": route_id,
+                    "duration_ms": _ms(elapsed),
+                    "spans": {
+                        name: {"count": current.counts[name], "duration_ms": _ms(total)}
+                        for name, total in current.totals.items()
+                    },
+                }
+            )
+        )
+
+
+def propagate(func: Callable) -> Callable:
+    """Binds the caller's trace and span to `func`, so work handed to a thread pool is still recorded on the
+    request that scheduled it."""
+    current_trace, current_span = CURRENT_TRACE.get(), CURRENT_SPAN.get()
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        trace_token = CURRENT_TRACE.set(current_trace)
+        span_token = CURRENT_SPAN.set(current_span)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            CURRENT_SPAN.reset(span_token)
+            CURRENT_TRACE.reset(trace_token)
+
+    return wrapper
+
+
+def trace_slack_client(client: WebClient) -> WebClient:
+    """Wraps the client's api_call, which every WebClient method goes through, in a "slack.api" span."""
+    if getattr(client, "_traced", False):
+        return client
+    api_call = client.api_call
+
+    def traced_api_call(api_method: str, **kwargs):
+        with span("slack.api", method=api_method):
+            return api_call(api_method, **kwargs)
+
+    client.api_call = traced_api_call
+    client._traced = True
+    return client
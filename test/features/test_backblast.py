@@ -0,0 +1,133 @@
+import logging
+import os
+import sys
+from datetime import date
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+from sqlalchemy.exc import OperationalError
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "..", "slackblast"))
+import features.backblast
+from features.backblast import apply_backblast_edit, notify_db_save_failed, save_backblast_to_db
+from utilities import jobs
+from utilities.database.orm import Attendance, Backblast
+
+
+def make_edit(user_ids):
+    backblast_record = Backblast(
+        timestamp="1.0", ts_edited="2.0", ao_id="C2", bd_date=date(2024, 1, 2), q_user_id="U1", backblast="edited"
+    )
+    attendance_records = [
+        Attendance(timestamp="1.0", ts_edited="2.0", user_id=user_id, ao_id="C2", date=date(2024, 1, 2), q_user_id="U1")
+        for user_id in user_ids
+    ]
+    return backblast_record, attendance_records
+
+
+def make_tx(existing_user_ids, backblast_exists=True):
+    tx = MagicMock()
+    tx.update_records.return_value = 1 if backblast_exists else 0
+    tx.find_values.return_value = [SimpleNamespace(user_id=user_id) for user_id in existing_user_ids]
+    return tx
+
+
+def test_apply_backblast_edit_writes_attendance_delta():
+    tx = make_tx(["U1", "U2", "U3"])
+    backblast_record, attendance_records = make_edit(["U1", "U3", "U4"])
+
+    counts = apply_backblast_edit(tx, backblast_record, attendance_records, replace_ts="1.0")
+
+    assert counts == {"attendance_added": 1, "attendance_removed": 1, "attendance_updated": 2}
+
+    backblast_update, attendance_update = tx.update_records.call_args_list
+    assert backblast_update.args[0] is Backblast
+    assert "timestamp" not in backblast_update.args[2]
+    assert "json" not in backblast_update.args[2]
+    assert backblast_update.args[2]["backblast"] == "edited"
+    assert attendance_update.args[0] is Attendance
+    assert sorted(attendance_update.args[1][1].right.value) == ["U1", "U3"]
+
+    tx.delete_records.assert_called_once()
+    assert tx.delete_records.call_args.args[1][1].right.value == ["U2"]
+
+    inserted = tx.bulk_insert.call_args.args[1]
+    assert [record.user_id for record in inserted] == ["U4"]
+
+
+def test_apply_backblast_edit_without_attendance_changes():
+    tx = make_tx(["U1", "U2"])
+    backblast_record, attendance_records = make_edit(["U1", "U2"])
+
+    counts = apply_backblast_edit(tx, backblast_record, attendance_records, replace_ts="1.0")
+
+    assert counts == {"attendance_added": 0, "attendance_removed": 0, "attendance_updated": 2}
+    tx.delete_records.assert_not_called()
+    assert tx.bulk_insert.call_args.args[1] == []
+
+
+def test_apply_backblast_edit_inserts_missing_backblast():
+    tx = make_tx([], backblast_exists=False)
+    backblast_record, attendance_records = make_edit(["U1"])
+
+    counts = apply_backblast_edit(tx, backblast_record, attendance_records, replace_ts="1.0")
+
+    assert counts == {"attendance_added": 1, "attendance_removed": 0, "attendance_updated": 0}
+    backblast_insert, attendance_insert = tx.bulk_insert.call_args_list
+    assert backblast_insert.args == (Backblast, [backblast_record])
+    assert [record.user_id for record in attendance_insert.args[1]] == ["U1"]
+
+
+def run_db_save_job(monkeypatch, enter_side_effect):
+    transaction = MagicMock()
+    transaction.return_value.__enter__.side_effect = enter_side_effect
+    monkeypatch.setattr(features.backblast.DbManager, "transaction", transaction)
+    monkeypatch.setattr(features.backblast, "get_channel_id", lambda **kwargs: None)
+    monkeypatch.setattr(jobs.time, "sleep", lambda seconds: None)
+    client = MagicMock()
+    context = {"user_id": "U1"}
+    region_record = SimpleNamespace(paxminer_schema="f3test", workspace_name="F3 Test")
+    backblast_record, attendance_records = make_edit(["U1"])
+
+    job = jobs.Job(
+        name="backblast_db_save",
+        func=save_backblast_to_db,
+        kwargs={
+            "client": client,
+            "logger": logging.getLogger(),
+            "context": context,
+            "region_record": region_record,
+            "backblast_record": backblast_record,
+            "attendance_records": attendance_records,
+            "replace_ts": None,
+            "channel": "C2",
+            "log_msg": "saved",
+        },
+        max_attempts=3,
+        on_failure=lambda e: notify_db_save_failed(client, context, region_record),
+    )
+    jobs.run_job(job, logging.getLogger())
+    return job, client
+
+
+def transient_error():
+    return OperationalError("INSERT", {}, Exception("MySQL server has gone away"))
+
+
+def test_db_save_job_retries_transient_errors(monkeypatch):
+    tx = make_tx([])
+    tx.bulk_insert.return_value = 1
+    job, client = run_db_save_job(monkeypatch, [transient_error(), tx])
+
+    assert job.status == jobs.SUCCEEDED
+    assert job.attempts == 2
+    client.chat_postMessage.assert_not_called()
+
+
+def test_db_save_job_notifies_once_after_final_failure(monkeypatch):
+    job, client = run_db_save_job(monkeypatch, [transient_error() for _ in range(3)])
+
+    assert job.status == jobs.FAILED
+    assert job.attempts == 3
+    client.chat_postMessage.assert_called_once()
+    assert "could not be saved" in client.chat_postMessage.call_args.kwargs["text"]
@@ -0,0 +1,128 @@
+import logging
+import os
+import sys
+from unittest.mock import MagicMock
+
+import pytest
+from botocore.exceptions import ClientError
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "..", "slackblast"))
+from utilities import announcements
+from utilities.announcements import Delivery, FileDeliveryJournal, S3DeliveryJournal, TokenBucket
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(announcements.time, "monotonic", clock.monotonic)
+    monkeypatch.setattr(announcements.time, "sleep", clock.sleep)
+    return clock
+
+
+def test_token_bucket_allows_burst(clock):
+    bucket = TokenBucket(rate=1, capacity=3)
+    for _ in range(3):
+        bucket.acquire()
+    assert clock.sleeps == []
+
+
+def test_token_bucket_waits_for_refill(clock):
+    bucket = TokenBucket(rate=2, capacity=1)
+    bucket.acquire()
+    bucket.acquire()
+    assert clock.sleeps == [pytest.approx(0.5)]
+
+
+def test_token_bucket_refills_up_to_capacity(clock):
+    bucket = TokenBucket(rate=1, capacity=2)
+    bucket.acquire()
+    bucket.acquire()
+    clock.now += 60
+    bucket.acquire()
+    bucket.acquire()
+    assert clock.sleeps == []
+    bucket.acquire()
+    assert clock.sleeps == [pytest.approx(1)]
+
+
+def test_token_bucket_pause(clock):
+    bucket = TokenBucket(rate=8, capacity=5)
+    bucket.pause(30)
+    bucket.acquire()
+    assert sum(clock.sleeps) == pytest.approx(30)
+    # a pause leaves a single token, so the next call waits for a refill rather than bursting
+    bucket.acquire()
+    assert sum(clock.sleeps) == pytest.approx(30.125)
+
+
+def test_deliver_stays_sent_when_journal_write_fails(monkeypatch):
+    client = MagicMock()
+    client.chat_postMessage.return_value = {"ts": "1.0"}
+    monkeypatch.setattr(announcements, "WebClient", lambda token: client)
+    journal = MagicMock()
+    journal.record.side_effect = OSError("disk full")
+
+    delivery = Delivery(team_id="T1", workspace_name="F3 Test", channel="C1", bot_token="xoxb")
+    announcements.deliver(delivery, "Hello, {region}!", journal, logging.getLogger())
+
+    assert delivery.status == "sent"
+    assert delivery.attempts == 1
+    client.chat_postMessage.assert_called_once_with(channel="C1", text="Hello, F3 Test!")
+
+
+def test_file_journal_resumes_same_message_only(tmp_path):
+    path = str(tmp_path / "journal.json")
+    FileDeliveryJournal(path, "Hello, {region}!").record("T1", "1.0")
+
+    assert FileDeliveryJournal(path, "Hello, {region}!").is_delivered("T1")
+    assert not FileDeliveryJournal(path, "Goodbye, {region}!").is_delivered("T1")
+
+
+def test_s3_journal_round_trip(monkeypatch):
+    objects = {}
+    s3 = MagicMock()
+
+    def get_object(Bucket, Key):
+        if (Bucket, Key) not in objects:
+            raise ClientError({"Error": {"Code": "NoSuchKey"}}, "GetObject")
+        return {"Body": MagicMock(read=lambda: objects[(Bucket, Key)])}
+
+    s3.get_object.side_effect = get_object
+    s3.put_object.side_effect = lambda Bucket, Key, Body, ContentType: objects.update({(Bucket, Key): Body})
+    monkeypatch.setattr(announcements, "get_s3_client", lambda: s3)
+
+    journal = S3DeliveryJournal("state-bucket", "announcements/journal.json", "Hello, {region}!")
+    assert not journal.is_delivered("T1")
+    journal.record("T1", "1.0")
+
+    assert S3DeliveryJournal("state-bucket", "announcements/journal.json", "Hello, {region}!").is_delivered("T1")
+
+
+def test_get_journal_defaults_to_state_bucket_when_deployed(monkeypatch):
+    monkeypatch.delenv("ANNOUNCEMENT_JOURNAL_PATH", raising=False)
+    monkeypatch.setenv("ENV_SLACK_STATE_S3_BUCKET_NAME", "state-bucket")
+    monkeypatch.setattr(announcements.constants, "LOCAL_DEVELOPMENT", False)
+    monkeypatch.setattr(S3DeliveryJournal, "read", lambda self: None)
+
+    journal = announcements.get_journal("Hello, {region}!")
+    assert isinstance(journal, S3DeliveryJournal)
+    assert (journal.bucket, journal.key) == ("state-bucket", "announcements/journal.json")
+
+    monkeypatch.setattr(announcements.constants, "LOCAL_DEVELOPMENT", True)
+    monkeypatch.setattr(FileDeliveryJournal, "read", lambda self: None)
+    journal = announcements.get_journal("Hello, {region}!")
+    assert isinstance(journal, FileDeliveryJournal)
+    assert journal.path == announcements.constants.ANNOUNCEMENT_DEFAULT_JOURNAL_PATH
@@ -0,0 +1,82 @@
+import os
+import re
+import sys
+from datetime import date
+from unittest.mock import MagicMock
+
+from sqlalchemy.dialects import mysql
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "..", "slackblast"))
+import utilities.database
+from utilities.database import DbManager
+from utilities.database.orm import Attendance, Backblast
+
+
+def compile_mysql(statement) -> str:
+    sql = " ".join(str(statement.compile(dialect=mysql.dialect())).split())
+    return re.sub(r"anon_\d+", "anon", sql)
+
+
+def test_exists_single_round_trip(monkeypatch):
+    session = MagicMock()
+    session.execute.return_value.scalar.return_value = 1
+    monkeypatch.setattr(utilities.database, "get_session", lambda schema=None: session)
+
+    assert DbManager.exists(
+        [
+            (Backblast, [Backblast.q_user_id == "U1", Backblast.ao_id == "C1", Backblast.bd_date == date(2024, 1, 1)]),
+            (Attendance, [Attendance.q_user_id == "U1", Attendance.ao_id == "C1", Attendance.date == date(2024, 1, 1)]),
+        ],
+        schema="f3devregion",
+    )
+    session.execute.assert_called_once()
+    session.close.assert_called_once()
+
+    sql = compile_mysql(session.execute.call_args.args[0])
+    assert sql == (
+        "SELECT (EXISTS (SELECT %s AS anon FROM beatdowns "
+        "WHERE beatdowns.q_user_id = %s AND beatdowns.ao_id = %s AND beatdowns.bd_date = %s)) "
+        "OR (EXISTS (SELECT %s AS anon FROM bd_attendance "
+        "WHERE bd_attendance.q_user_id = %s AND bd_attendance.ao_id = %s AND bd_attendance.date = %s)) AS anon"
+    )
+
+
+def test_exists_no_match(monkeypatch):
+    session = MagicMock()
+    session.execute.return_value.scalar.return_value = 0
+    monkeypatch.setattr(utilities.database, "get_session", lambda schema=None: session)
+
+    assert not DbManager.exists([(Backblast, [Backblast.timestamp == "1"])])
+
+
+def test_bulk_insert_is_one_multi_row_upsert():
+    records = [
+        Attendance(timestamp="1", ts_edited=None, user_id=user_id, ao_id="C1", date=date(2024, 1, 1), q_user_id="U1")
+        for user_id in ["U1", "U2", "U3"]
+    ]
+    statement = utilities.database._bulk_insert_statement(
+        Attendance, records, update_columns=[Attendance.timestamp, Attendance.ts_edited]
+    )
+    sql = compile_mysql(statement)
+
+    # only the columns set on the records are written, so json (missing from older PAXMiner schemas) is left out
+    row = "(%s, %s, %s, %s, %s, %s)"
+    assert sql == (
+        "INSERT INTO bd_attendance (timestamp, ts_edited, user_id, ao_id, date, q_user_id) "
+        f"VALUES {row}, {row}, {row} "
+        "ON DUPLICATE KEY UPDATE timestamp = VALUES(timestamp), ts_edited = VALUES(ts_edited)"
+    )
+
+
+def test_bulk_insert_without_update_columns():
+    row = {"timestamp": "1", "user_id": "U2", "ao_id": "C1", "date": date(2024, 1, 1), "q_user_id": "U1"}
+    statement = utilities.database._bulk_insert_statement(Attendance, [row])
+    assert compile_mysql(statement) == (
+        "INSERT INTO bd_attendance (timestamp, user_id, ao_id, date, q_user_id) VALUES (%s, %s, %s, %s, %s)"
+    )
+
+
+def test_transaction_bulk_insert_skips_empty_list():
+    tx = utilities.database.DbTransaction(MagicMock())
+    assert tx.bulk_insert(Attendance, []) == 0
+    tx.session.execute.assert_not_called()
@@ -0,0 +1,116 @@
+import copy
+import importlib
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "..", "slackblast"))
+from utilities import request_logging
+from utilities.request_logging import REDACTED, parse_sample_rate, parse_sample_rates, redact, serialize
+from utilities.slack import actions, forms
+
+
+def test_parse_sample_rates():
+    assert parse_sample_rates("/backblast=1, team_join=0,strava-activity=0.25") == {
+        "/backblast": 1.0,
+        "team_join": 0.0,
+        "strava-activity": 0.25,
+    }
+
+
+def test_parse_sample_rates_skips_bad_entries():
+    assert parse_sample_rates("/backblast=abc,noequals,=0.5,team_join=0.1") == {"team_join": 0.1}
+    assert parse_sample_rates(None) == {}
+    assert parse_sample_rates("") == {}
+
+
+def test_redact_nested_fields():
+    body = {
+        "token": "secret",
+        "view": {"state": {"email_password": "hunter2", "text": "moleskine"}},
+        "actions": [{"trigger_id": "123", "action_id": "backblast-edit"}],
+    }
+    assert redact(body) == {
+        "token": REDACTED,
+        "view": {"state": {"email_password": REDACTED, "text": "moleskine"}},
+        "actions": [{"trigger_id": REDACTED, "action_id": "backblast-edit"}],
+    }
+    assert body["token"] == "secret"
+
+
+def test_redact_truncates_long_strings():
+    assert redact({"text": "a" * 10}, max_string_length=4) == {"text": "aaaa...[6 more]"}
+    assert redact({"text": "a" * 4}, max_string_length=4) == {"text": "aaaa"}
+
+
+def test_serialize_caps_size():
+    assert serialize({"a": 1}) == '{"a":1}'
+    assert serialize({"a": "x" * 20}, max_bytes=10) == '{"a":"xxxx...[truncated 18 chars]'
+
+
+def test_should_sample_uses_route_rate(monkeypatch):
+    monkeypatch.setattr(request_logging, "DEFAULT_SAMPLE_RATE", 0)
+    monkeypatch.setattr(request_logging, "ROUTE_SAMPLE_RATES", {"/backblast": 1})
+    assert request_logging.should_sample("/backblast")
+    assert not request_logging.should_sample("team_join")
+
+
+def make_config_email_submission(password):
+    form = copy.deepcopy(forms.CONFIG_EMAIL_FORM)
+    form.set_initial_values({actions.CONFIG_EMAIL_PASSWORD: password, actions.CONFIG_EMAIL_SERVER: "smtp.gmail.com"})
+    return {
+        "type": "view_submission",
+        "team": {"id": "T1", "domain": "f3test"},
+        "user": {"id": "U1", "team_id": "T1"},
+        "token": "verification-token",
+        "trigger_id": "123.456",
+        "view": {
+            "id": "V1",
+            "type": "modal",
+            "callback_id": actions.CONFIG_EMAIL_CALLBACK_ID,
+            "blocks": form.as_form_field(),
+            "state": {
+                "values": {
+                    actions.CONFIG_EMAIL_SERVER: {
+                        actions.CONFIG_EMAIL_SERVER: {"type": "plain_text_input", "value": "smtp.gmail.com"}
+                    },
+                    actions.CONFIG_EMAIL_PASSWORD: {
+                        actions.CONFIG_EMAIL_PASSWORD: {"type": "plain_text_input", "value": password}
+                    },
+                }
+            },
+        },
+    }
+
+
+def test_redact_config_email_password():
+    body = make_config_email_submission("hunter2-app-password")
+    assert "hunter2-app-password" in serialize(body)
+
+    for logged in (serialize(redact(body)), serialize(redact(body, max_string_length=256), max_bytes=4096)):
+        assert "hunter2-app-password" not in logged
+
+    redacted = redact(body)
+    password_block = next(b for b in redacted["view"]["blocks"] if b["block_id"] == actions.CONFIG_EMAIL_PASSWORD)
+    assert password_block["type"] == "input"
+    assert password_block["element"] == REDACTED
+    assert redacted["view"]["state"]["values"][actions.CONFIG_EMAIL_PASSWORD] == REDACTED
+    # other inputs are kept
+    assert "smtp.gmail.com" in serialize(redacted)
+
+
+def test_parse_sample_rate_falls_back_on_bad_values():
+    assert parse_sample_rate("0.5", 0.05) == 0.5
+    assert parse_sample_rate("five percent", 0.05) == 0.05
+    assert parse_sample_rate(None, 0.05) == 0.05
+
+
+def test_malformed_default_sample_rate_does_not_break_import(monkeypatch):
+    monkeypatch.setenv("REQUEST_LOG_SAMPLE_RATE", "five percent")
+    try:
+        assert importlib.reload(request_logging).DEFAULT_SAMPLE_RATE in (
+            1.0,
+            request_logging.constants.REQUEST_LOG_DEFAULT_SAMPLE_RATE,
+        )
+    finally:
+        monkeypatch.delenv("REQUEST_LOG_SAMPLE_RATE")
+        importlib.reload(request_logging)
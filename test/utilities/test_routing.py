@@ -0,0 +1,73 @@
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "..", "slackblast"))
+from utilities.routing import PrefixTrie, Route, Router
+
+
+def make_router():
+    return Router(
+        routes={
+            "command": [("/backblast", "features.backblast.build_backblast_form", True)],
+            "block_actions": [("strava-activity", "features.strava.build_strava_form", False)],
+        },
+        prefix_routes={
+            "block_actions": [
+                ("strava-", "features.strava.build_strava_form", False),
+                ("strava-activity-", "features.strava.build_strava_modify_form", False),
+            ],
+        },
+    )
+
+
+def test_exact_match():
+    route = make_router().resolve("command", "/backblast")
+    assert route.handler_path == "features.backblast.build_backblast_form"
+    assert route.add_loading
+
+
+def test_exact_match_wins_over_prefix():
+    assert make_router().resolve("block_actions", "strava-activity").route_id == "strava-activity"
+
+
+def test_longest_prefix_match():
+    router = make_router()
+    assert router.resolve("block_actions", "strava-activity-123").route_id == "strava-activity-"
+    assert router.resolve("block_actions", "strava-other").route_id == "strava-"
+
+
+def test_no_match():
+    router = make_router()
+    assert router.resolve("block_actions", "unknown") is None
+    assert router.resolve("command", "/backblast-extra") is None
+    assert router.resolve("view_submission", "/backblast") is None
+
+
+def test_duplicate_exact_route():
+    with pytest.raises(ValueError):
+        Router(routes={"command": [("/backblast", "a.b", False), ("/backblast", "a.c", False)]})
+
+
+def test_duplicate_prefix_route():
+    trie = PrefixTrie()
+    trie.insert("strava-", Route("block_actions", "strava-", "a.b", False))
+    with pytest.raises(ValueError):
+        trie.insert("strava-", Route("block_actions", "strava-", "a.c", False))
+
+
+def test_stats():
+    router = make_router()
+    route = router.resolve("command", "/backblast")
+    router.record(route, 0.2)
+    router.record(route, 0.4)
+    assert router.stats() == [
+        {
+            "request_type": "command",
+            "route_id": "/backblast",
+            "hits": 2,
+            "avg_time": pytest.approx(0.3),
+            "max_time": 0.4,
+        }
+    ]
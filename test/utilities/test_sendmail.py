@@ -0,0 +1,60 @@
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "..", "slackblast"))
+from utilities.sendmail import fit_attachments
+
+
+def make_attachment(tmp_path, name, size, low_res_size=None, url=None):
+    filepath = tmp_path / f"{name}.jpg"
+    filepath.write_bytes(b"x" * size)
+    attachment = {"filepath": str(filepath), "meta": {"filename": f"{name}.jpg"}}
+    if low_res_size is not None:
+        low_res_filepath = tmp_path / f"{name}_low_res.jpg"
+        low_res_filepath.write_bytes(b"x" * low_res_size)
+        attachment["low_res_filepath"] = str(low_res_filepath)
+        attachment["low_res_meta"] = {"filename": f"{name}_low_res.jpg"}
+    if url:
+        attachment["url"] = url
+    return attachment
+
+
+def test_fit_attachments_no_limit(tmp_path):
+    attachments = [make_attachment(tmp_path, "a", 100), make_attachment(tmp_path, "b", 200)]
+    chosen, links = fit_attachments(attachments)
+    assert [meta["filename"] for _, meta in chosen] == ["a.jpg", "b.jpg"]
+    assert links == []
+
+
+def test_fit_attachments_prefers_all_low_res_over_some_originals(tmp_path):
+    attachments = [make_attachment(tmp_path, name, 600, low_res_size=300) for name in ["a", "b", "c"]]
+    chosen, links = fit_attachments(attachments, attachment_limit=1000)
+    # the originals don't all fit, but every low res version does, rather than a's original plus b's low res
+    assert [meta["filename"] for _, meta in chosen] == ["a_low_res.jpg", "b_low_res.jpg", "c_low_res.jpg"]
+    assert links == []
+
+
+def test_fit_attachments_uses_all_originals_when_they_fit(tmp_path):
+    attachments = [make_attachment(tmp_path, name, 300, low_res_size=100) for name in ["a", "b", "c"]]
+    chosen, links = fit_attachments(attachments, attachment_limit=1000)
+    assert [meta["filename"] for _, meta in chosen] == ["a.jpg", "b.jpg", "c.jpg"]
+    assert links == []
+
+
+def test_fit_attachments_falls_back_to_links_when_low_res_does_not_fit(tmp_path):
+    attachments = [
+        make_attachment(tmp_path, "a", 600, low_res_size=100),
+        make_attachment(tmp_path, "b", 600, low_res_size=300),
+        make_attachment(tmp_path, "c", 900, low_res_size=700, url="https://example.com/c.jpg"),
+    ]
+    chosen, links = fit_attachments(attachments, attachment_limit=1000)
+    # even the low res versions are 1100 bytes together, so c is linked instead
+    assert [meta["filename"] for _, meta in chosen] == ["a_low_res.jpg", "b_low_res.jpg"]
+    assert links == ["https://example.com/c.jpg"]
+
+
+def test_fit_attachments_drops_files_without_a_link(tmp_path):
+    attachments = [make_attachment(tmp_path, "a", 600), make_attachment(tmp_path, "b", 50)]
+    chosen, links = fit_attachments(attachments, attachment_limit=100)
+    assert [meta["filename"] for _, meta in chosen] == ["b.jpg"]
+    assert links == []